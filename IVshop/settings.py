@@ -131,8 +131,118 @@ STATIC_URL = '/static/'
 
 if not DEBUG:
     STATIC_ROOT = "/var/www/myproject/static/"  # Tutaj ustaw sobie ścieżkę do plików statyczny na prodzie
+    # collectstatic zapisuje kopie plików z hashem w nazwie oraz wersje .gz i .br (shop/utils/static_files.py)
+    STATICFILES_STORAGE = 'shop.utils.static_files.CompressedManifestStaticFilesStorage'
 else:
     STATICFILES_DIRS = [
         os.path.join(BASE_DIR, "static")
     ]
 
+STATIC_CACHE_MAX_AGE = 60 * 60  # Dla plików bez hasha w nazwie, na przykład wczytywanych przez ckeditor
+
+# RCON
+# Połączenia rcon są trzymane w puli per proces (shop/utils/rcon_pool.py)
+
+RCON_TIMEOUT = 5
+RCON_POOL_MAX_IDLE = 5 * 60
+RCON_POOL_HEALTH_CHECK_AFTER = 30
+
+# Zadania okresowe (python manage.py run_worker)
+
+WORKER_LOCK_TTL = 30
+
+# Kolejka dostarczania komend (shop/utils/delivery.py)
+
+DELIVERY_POLL_INTERVAL = 1
+DELIVERY_MAX_ATTEMPTS = 8
+DELIVERY_RETRY_BASE = 10
+DELIVERY_RETRY_MAX = 60 * 60
+DELIVERY_LOCK_TIMEOUT = 5 * 60
+
+# Powiadomienia o zakupach na Discordzie (shop/utils/notifications.py)
+
+DISCORD_NOTIFY_INTERVAL = 2
+DISCORD_NOTIFY_WINDOW = 5  # Zakupy z tego okna trafiają do jednej wiadomości
+DISCORD_NOTIFY_BATCH = 500
+DISCORD_NOTIFY_MAX_ATTEMPTS = 5
+DISCORD_NOTIFY_RETRY_BASE = 10
+DISCORD_NOTIFY_RETRY_MAX = 10 * 60
+
+# Sprawdzanie połączeń rcon (shop/utils/rcon_health.py)
+
+RCON_HEALTH_CHECK_INTERVAL = 5 * 60
+RCON_HEALTH_CHECK_WINDOW = 60
+RCON_HEALTH_CHECK_CONCURRENCY = 50
+RCON_HEALTH_CHECK_FAILURES = 3
+
+# Server List Ping (shop/utils/server_list_ping.py)
+
+SERVER_PING_TIMEOUT = 5
+SERVER_PING_CONCURRENCY = 200
+SERVER_PING_NAMESERVER = None  # None - serwer DNS z /etc/resolv.conf
+
+# Odświeżanie statusu serwerów (shop/utils/server_status.py)
+
+SERVER_STATUS_TICK = 10
+SERVER_STATUS_INTERVAL = 6 * 60
+SERVER_STATUS_ACTIVE_INTERVAL = 60
+SERVER_STATUS_ACTIVE_WINDOW = 15 * 60
+SERVER_STATUS_MAX_INTERVAL = 60 * 60
+SERVER_STATUS_BATCH_SIZE = 500
+SERVER_VIEW_TRACKING_INTERVAL = 60
+
+# Historia zakupów w panelu (shop/utils/history.py)
+
+PURCHASE_HISTORY_PAGE_SIZE = 50
+PURCHASE_HISTORY_MAX_PAGE_SIZE = 200
+
+# Statystyki sprzedaży w panelu (shop/utils/stats.py)
+
+SALES_STATS_DEFAULT_DAYS = 30
+SALES_STATS_MAX_DAYS = 366
+
+# Mapa własnych domen sklepów (shop/utils/domains.py)
+
+DOMAIN_ROUTES_MAX_AGE = 60
+DOMAIN_ROUTES_CHECK_INTERVAL = 5
+
+# Cache strony sklepu (shop/utils/page_cache.py)
+
+SHOP_PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Pośrednik obrazków (shop/utils/images.py)
+
+SITE_URL = 'https://ivshop.pl'
+AVATAR_URL = 'https://minotar.net/avatar/{player}/{size}'
+AVATAR_MAX_SIZE = 128
+AVATAR_REFRESH_INTERVAL = 24 * 60 * 60
+PRODUCT_IMAGE_MAX_WIDTH = 600
+PRODUCT_IMAGE_MAX_HEIGHT = 600
+IMAGE_CACHE_DIR = os.path.join(BASE_DIR, 'image_cache')
+IMAGE_CACHE_MAX_SIZE = 200 * 1024 * 1024
+IMAGE_CACHE_MAX_AGE = 24 * 60 * 60  # Cache-Control dla przeglądarek
+IMAGE_PROXY_MAX_BYTES = 5 * 1024 * 1024
+IMAGE_PROXY_MAX_PIXELS = 25 * 1000 * 1000
+IMAGE_PROXY_JPEG_QUALITY = 85
+IMAGE_PROXY_ALLOW_PRIVATE = False  # Pobieranie z adresów w sieci lokalnej, tylko do testów
+
+# Zapytania do zewnętrznych usług (shop/utils/http.py)
+# timeout to (łączenie, odczyt) w sekundach, retries - ponowienia po błędzie połączenia,
+# status_retries - ponowienia po odpowiedzi 5xx (tylko GET i inne metody idempotentne)
+HTTP_INTEGRATIONS = {
+    'default': {'timeout': (3, 10), 'retries': 1},
+    'lvlup': {'timeout': (3, 10), 'retries': 2},
+    'microsms': {'timeout': (3, 10), 'retries': 2},
+    'recaptcha': {'timeout': (3, 5), 'retries': 2},
+    'discord_oauth': {'timeout': (3, 10), 'retries': 2},
+    'discord_webhook': {'timeout': (3, 10), 'retries': 2, 'status_retries': 2},
+    'images': {'timeout': (3, 5), 'retries': 1, 'status_retries': 1, 'pool_connections': 50},
+}
+HTTP_SLOW_REQUEST = 2  # Zapytania dłuższe niż tyle sekund są zapisywane w logach
+
+# Hurtowe generowanie voucherów (shop/utils/vouchers.py) i eksport z panelu (shop/utils/export.py)
+
+VOUCHER_BATCH_MAX_SIZE = 100000
+VOUCHER_BATCH_CODE_LENGTH = 10
+VOUCHER_BATCH_CHUNK_SIZE = 5000
+EXPORT_CHUNK_SIZE = 2000  # Wiersze pobierane z bazy naraz przez .iterator()
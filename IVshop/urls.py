@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.views.static import serve
 from django.conf import settings
 from config import DJANGO_ADMIN_URL
+from shop.utils.static_files import serve_static
 
 urlpatterns = [
     path('', include('shop.urls')),
@@ -10,7 +11,7 @@ urlpatterns = [
     path('api/', include('shop.api.urls')),
     path(f'{DJANGO_ADMIN_URL}/', admin.site.urls),
     re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-    re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
+    re_path(r'^static/(?P<path>.*)$', serve_static),
 ]
 
 handler404 = 'shop.views.handler404'
@@ -5,10 +5,15 @@ import re
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.db import transaction
 from lvluppayments.payments import Payments
 
-from shop.utils.functions import send_commands, send_webhook_discord, validate_player_nick
-from shop.models import PaymentOperator, Product, Purchase
+from shop.utils.functions import validate_player_nick
+from shop.utils.http import http_client
+from shop.utils.prices import product_price
+from shop.utils.purchases import load_product_context, load_purchase_context
+from shop.utils.delivery import enqueue_delivery
+from shop.models import Purchase
 
 
 @csrf_exempt
@@ -23,48 +28,34 @@ def buy_lvlup_sms(request):
     if not validate_player_nick(player_nick):
         return JsonResponse({'message': 'Niepoprawny format nicku.'}, status=406)
 
-    product = Product.objects.filter(id=product_id, lvlup_sms_number=sms_number).values('server__server_ip',
-                                                                                  'server__rcon_password',
-                                                                                  'product_commands',
-                                                                                  'server__server_status', 'product_name',
-                                                                                  'server__rcon_port', 'server__id', 'server__discord_webhook')
-    server_id = product[0]['server__id']
-
-    payment_operator = PaymentOperator.objects.filter(server__id=server_id, operator_type='lvlup_sms').values('client_id')
-
-    if not product.exists() or not payment_operator.exists():
+    context = load_product_context(product_id, 'lvlup_sms', lvlup_sms_number=sms_number)
+    if context is None:
         return JsonResponse({'message': 'Otóż nie tym razem ( ͡° ͜ʖ ͡°).'}, status=401)
-    if product[0]['server__server_status'] == 0:
+    if not context.server_status:
         return JsonResponse(
             {'message': 'Serwer jest aktualnie wyłączony, zachowaj kod i wykorzystaj go, gdy serwer będzie włączony.'},
             status=411
             )
 
-    client_id = payment_operator[0]['client_id']
-
-    url = f"https://lvlup.pro/api/checksms?id={client_id}&code={sms_code}&number={sms_number}&desc=[IVshop] Zarobek z itemshopu ({player_nick})"
-    r = requests.get(url).json()
+    url = f"https://lvlup.pro/api/checksms?id={context.client_id}&code={sms_code}&number={sms_number}&desc=[IVshop] Zarobek z itemshopu ({player_nick})"
+    try:
+        r = http_client('lvlup').get(url).json()
+    except (requests.RequestException, ValueError):
+        return JsonResponse({'message': 'Nie udało się sprawdzić kodu SMS, spróbuj ponownie.'}, status=503)
     if not r['valid']:
         return JsonResponse({'message': 'Niepoprawny kod SMS.'}, status=401)
 
-    server_ip = product[0]['server__server_ip']
-    rcon_password = product[0]['server__rcon_password']
-    commands = product[0]['product_commands'].split(';')
-    rcon_port = product[0]['server__rcon_port']
-    try:
-        send_commands(server_ip, rcon_password, commands, player_nick, rcon_port)
-    except:
-        return JsonResponse({'message': 'Wystąpił błąd podczas łączenia się do rcon.'}, status=401)
-
-    p = Purchase(
-        lvlup_id="lvlup_sms",
-        buyer=player_nick,
-        product=Product.objects.get(id=product_id),
-        status=1,
-    )
-    p.save()
-    if product[0]['server__discord_webhook']:
-        send_webhook_discord(product[0]['server__discord_webhook'], player_nick, product[0]['product_name'])
+    with transaction.atomic():
+        p = Purchase(
+            lvlup_id="lvlup_sms",
+            buyer=player_nick,
+            product_id=context.product_id,
+            status=2,
+            operator='lvlup_sms',
+            price=product_price('lvlup_sms', None, int(sms_number), None),
+        )
+        p.save()
+        enqueue_delivery(context.server_id, context.product_commands, player_nick, purchase_id=p.id)
     return JsonResponse({'message': 'Zakupiono produkt.'}, status=200)
 
 
@@ -80,31 +71,24 @@ def buy_microsms_sms(request):
     if not validate_player_nick(player_nick):
         return JsonResponse({'message': 'Niepoprawny format nicku.'}, status=406)
 
-    product = Product.objects.filter(id=product_id, microsms_sms_number=sms_number).values('server__server_ip',
-                                                                                  'server__rcon_password',
-                                                                                  'product_commands',
-                                                                                  'server__server_status', 'product_name',
-                                                                                  'server__rcon_port', 'server__id', 'server__discord_webhook')
-
-    payment_operator = PaymentOperator.objects.filter(server__id=product[0]['server__id'], operator_type='microsms_sms').values('client_id', 'sms_content', 'service_id')
-
-    if not product.exists() or not payment_operator.exists():
+    context = load_product_context(product_id, 'microsms_sms', microsms_sms_number=sms_number)
+    if context is None:
         return JsonResponse({'message': 'Otóż nie tym razem ( ͡° ͜ʖ ͡°).'}, status=401)
-    if product[0]['server__server_status'] == 0:
+    if not context.server_status:
         return JsonResponse(
             {'message': 'Serwer jest aktualnie wyłączony, zachowaj kod i wykorzystaj go, gdy serwer będzie włączony.'},
             status=411
             )
 
-    client_id = payment_operator[0]['client_id']
-    service_id = payment_operator[0]['service_id']
-
     pattern = re.compile("^[A-Za-z0-9]{8}$")
     if not pattern.match(sms_code):
         return JsonResponse({'message': 'Niepoprawny format kodu.'}, status=406)
 
-    url = f'https://microsms.pl/api/check_multi.php?userid={client_id}&code={sms_code}&serviceid={service_id}'
-    r = requests.get(url)
+    url = f'https://microsms.pl/api/check_multi.php?userid={context.client_id}&code={sms_code}&serviceid={context.service_id}'
+    try:
+        r = http_client('microsms').get(url)
+    except requests.RequestException:
+        return JsonResponse({'message': 'Nie udało się sprawdzić kodu SMS, spróbuj ponownie.'}, status=503)
     payment_status = r.text.strip()
     if payment_status == "E,2":
         return JsonResponse({'message': 'Brak partnera lub usługi.'}, status=401)
@@ -115,24 +99,17 @@ def buy_microsms_sms(request):
     elif payment_status[0] == "0":
         return JsonResponse({'message': 'Niepoprawny kod SMS.'}, status=401)
     elif payment_status[0] == "1":
-        server_ip = product[0]['server__server_ip']
-        rcon_password = product[0]['server__rcon_password']
-        commands = product[0]['product_commands'].split(';')
-        rcon_port = product[0]['server__rcon_port']
-        try:
-            send_commands(server_ip, rcon_password, commands, player_nick, rcon_port)
-        except:
-            return JsonResponse({'message': 'Wystąpił błąd podczas łączenia się do rcon.'}, status=401)
-
-        p = Purchase(
-            lvlup_id="microsms_sms",
-            buyer=player_nick,
-            product=Product.objects.get(id=product_id),
-            status=1,
-        )
-        p.save()
-        if product[0]['server__discord_webhook']:
-            send_webhook_discord(product[0]['server__discord_webhook'], player_nick, product[0]['product_name'])
+        with transaction.atomic():
+            p = Purchase(
+                lvlup_id="microsms_sms",
+                buyer=player_nick,
+                product_id=context.product_id,
+                status=2,
+                operator='microsms_sms',
+                price=product_price('microsms_sms', None, None, int(sms_number)),
+            )
+            p.save()
+            enqueue_delivery(context.server_id, context.product_commands, player_nick, purchase_id=p.id)
         return JsonResponse({'message': 'Zakupiono produkt.'}, status=200)
 
 
@@ -146,22 +123,22 @@ def buy_lvlup_other(request):
     if not validate_player_nick(player_nick):
         return JsonResponse({'message': 'Niepoprawny format nicku.'}, status=406)
 
-    product = Product.objects.filter(id=product_id).values('lvlup_other_price', 'server__server_status', 'server_id')
-    payment_operator = PaymentOperator.objects.filter(server_id=product[0]['server_id'], operator_type='lvlup_other').values('api_key')
-
-    if product[0]['server__server_status'] == 0:
+    context = load_product_context(product_id, 'lvlup_other')
+    if context is None:
+        return JsonResponse({'message': 'Otóż nie tym razem ( ͡° ͜ʖ ͡°).'}, status=401)
+    if not context.server_status:
         return JsonResponse({'message': 'Serwer jest aktualnie wyłączony.'}, status=411)
 
-    price = product[0]['lvlup_other_price']
+    price = product_price('lvlup_other', context.lvlup_other_price, None, None)
     if settings.DEBUG:
-        payment = Payments(payment_operator[0]['api_key'], 'sandbox')
+        payment = Payments(context.api_key, 'sandbox')
     else:
-        payment = Payments(payment_operator[0]['api_key'], 'production')
+        payment = Payments(context.api_key, 'production')
 
     domain = 'https://' + str(request.META['HTTP_HOST'])
     success_page2 = str(domain) + "/success"
     lvlup_check_page = str(domain) + "/payments/webhook/lvlup_other/"
-    link = payment.create_payment(format(float(price), '.2f'), success_page2, lvlup_check_page)
+    link = payment.create_payment(f'{price:.2f}', success_page2, lvlup_check_page)
 
     try:
         url = link['url']
@@ -171,8 +148,10 @@ def buy_lvlup_other(request):
     p = Purchase(
         lvlup_id=payment_id,
         buyer=player_nick,
-        product=Product.objects.get(id=product_id),
+        product_id=context.product_id,
         status=0,
+        operator='lvlup_other',
+        price=price,
     )
     p.save()
     return JsonResponse({'message': url}, status=200)
@@ -183,33 +162,20 @@ def webhook_lvlup_other(request):
     data = json.loads(request.body)
     paymentId = data['paymentId']
     status = data['status']
-    purchase = Purchase.objects.filter(lvlup_id=paymentId, status=0).values('id', 'product__product_commands', 'buyer',
-                                                                  'product__server__server_ip',
-                                                                  'product__server__rcon_password',
-                                                                  'product__product_commands',
-                                                                  'product__server__rcon_port', 'product__server_id', 'product__product_name',
-                                                                  'product__server__discord_webhook')
-    payment_operator = PaymentOperator.objects.filter(server_id=purchase[0]['product__server_id'], operator_type='lvlup_other').values('api_key')
+    context = load_purchase_context(paymentId, 'lvlup_other')
+    if context is None:
+        return JsonResponse({'message': 'Otóż nie tym razem ( ͡° ͜ʖ ͡°).'}, status=401)
 
     if settings.DEBUG:
-        payment = Payments(str(payment_operator[0]['api_key']), 'sandbox')
+        payment = Payments(str(context.api_key), 'sandbox')
     else:
-        payment = Payments(str(payment_operator[0]['api_key']), 'production')
-
-    if purchase.exists() and status == 'CONFIRMED' and payment.is_paid(str(paymentId)):
-        server_ip = purchase[0]['product__server__server_ip']
-        rcon_password = purchase[0]['product__server__rcon_password']
-        commands = purchase[0]['product__product_commands'].split(';')
-        rcon_port = purchase[0]['product__server__rcon_port']
-        try:
-            send_commands(server_ip, rcon_password, commands, purchase[0]['buyer'], rcon_port)
-        except:
-            return JsonResponse({'message': 'Wystąpił błąd podczas łączenia się do rcon.'}, status=401)
-        purchase.update(status=1)
-        if purchase[0]['product__server__discord_webhook']:
-            send_webhook_discord(purchase[0]['product__server__discord_webhook'], purchase[0]['buyer'], purchase[0]['product__product_name'])
+        payment = Payments(str(context.api_key), 'production')
+
+    if status == 'CONFIRMED' and payment.is_paid(str(paymentId)):
+        with transaction.atomic():
+            # Warunkowa zmiana statusu, żeby powtórzony webhook nie dodał komend do kolejki drugi raz
+            if Purchase.objects.filter(id=context.purchase_id, status=0).update(status=2):
+                enqueue_delivery(context.server_id, context.product_commands, context.buyer,
+                                 purchase_id=context.purchase_id)
         return JsonResponse({'message': 'Udało się.'}, status=200)
     return JsonResponse({'message': 'Otóż nie tym razem ( ͡° ͜ʖ ͡°).'}, status=401)
-
-
-
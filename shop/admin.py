@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Server, Product, Purchase, Voucher, PaymentOperator, ServerNavbarLink
+from .models import Server, Product, Purchase, Voucher, PaymentOperator, ServerNavbarLink, DeliveryJob, DailySales
 
 admin.site.register(Server)
 admin.site.register(PaymentOperator)
@@ -7,4 +7,5 @@ admin.site.register(Product)
 admin.site.register(Purchase)
 admin.site.register(Voucher)
 admin.site.register(ServerNavbarLink)
-
+admin.site.register(DeliveryJob)
+admin.site.register(DailySales)
@@ -1,5 +1,6 @@
 from shop.models import Server, Product
 from shop.api.serializers import ServerSerializer, ProductSerializer
+from shop.utils.page_cache import all_servers_validators, make_etag, conditional_response, set_validators
 
 from rest_framework import viewsets
 from rest_framework.response import Response
@@ -11,9 +12,14 @@ class ServersViewSet(viewsets.ViewSet):
     """
 
     def list(self, request):
+        etag, last_modified = all_servers_validators('servers', with_status=True)
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
         queryset = Server.objects.all()
         serializer = ServerSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
 
 
 class ProductsViewSet(viewsets.ViewSet):
@@ -22,9 +28,14 @@ class ProductsViewSet(viewsets.ViewSet):
     """
 
     def list(self, request):
+        etag, last_modified = all_servers_validators('products')
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
         queryset = Product.objects.all()
         serializer = ProductSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
 
 
 class ProductViewSet(viewsets.ViewSet):
@@ -36,17 +47,22 @@ class ProductViewSet(viewsets.ViewSet):
         if not 'user_id' in request.session:
             return Response({'detail': 'Nie jesteś zalogowany.'}, status=401)
 
-        queryset = Product.objects.filter(id=pk).values('server__id')
+        queryset = Product.objects.filter(id=pk).values('server__id', 'server__content_version',
+                                                        'server__content_updated')
         if not queryset:
             return Response({'detail': 'Nie znaleziono takiego produktu.'}, status=404)
 
         server_id = queryset[0]['server__id']
-        server = Server.objects.filter(id=server_id).values('owner_id')
-        admins = Server.get_admins(server_id)
 
-        if request.session['user_id'] in admins or request.session['user_id'] == str(server[0]['owner_id']):
+        if Server.user_has_access(server_id, request.session['user_id']):
+            etag = make_etag('product', pk, queryset[0]['server__content_version'])
+            last_modified = queryset[0]['server__content_updated']
+            response = conditional_response(request, etag, last_modified)
+            if response is not None:
+                return response
+
             serializer = ProductSerializer(Product.objects.get(id=pk))
-            return Response(serializer.data)
+            return set_validators(Response(serializer.data), etag, last_modified, private=True)
 
         return Response({'detail': 'Nie posiadasz dostępu do tego produktu.'}, status=401)
 
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shop.utils.stats import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Przelicza od nowa dzienne podsumowania sprzedaży na podstawie zrealizowanych zakupów.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', type=int, help='Id serwera, domyślnie wszystkie serwery')
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_sales(options['server'])
+        self.stdout.write(f'Zapisano {rows} wierszy podsumowań.')
@@ -0,0 +1,32 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop.utils.delivery import process_delivery_queue
+from shop.utils.notifications import DiscordNotifier
+from shop.utils.rcon_health import RconHealthChecker
+from shop.utils.rcon_pool import rcon_pool
+from shop.utils.server_status import ServerStatusRefresher
+from shop.utils.worker import Job, Worker
+
+
+class Command(BaseCommand):
+    help = 'Uruchamia zadania okresowe. Można uruchomić kilka procesów, zadania wykonuje tylko jeden z nich.'
+
+    def handle(self, *args, **options):
+        rcon_health_checker = RconHealthChecker()
+        server_status_refresher = ServerStatusRefresher()
+        discord_notifier = DiscordNotifier()
+
+        worker = Worker([
+            Job('delivery', settings.DELIVERY_POLL_INTERVAL, process_delivery_queue),
+            Job('discord_notifications', settings.DISCORD_NOTIFY_INTERVAL, discord_notifier.run_once),
+            Job('server_status', settings.SERVER_STATUS_TICK, server_status_refresher.run_once),
+            Job('rcon_health', settings.RCON_HEALTH_CHECK_INTERVAL, rcon_health_checker.run_once),
+            Job('rcon_pool', settings.RCON_POOL_HEALTH_CHECK_AFTER, rcon_pool.evict_idle),
+        ], lock_ttl=settings.WORKER_LOCK_TTL)
+
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        worker.run()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from shop.models import Product, Server
+from shop.utils.functions import sanitize_description
+
+
+class Command(BaseCommand):
+    help = 'Uzupełnia oczyszczone opisy produktów, które jeszcze ich nie mają.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Przelicz opisy wszystkich produktów, na przykład '
+                                                               'po zmianie SANITIZER_ALLOWED_TAGS')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        products = Product.objects.only('id', 'server_id', 'product_description', 'product_description_html')
+        if not options['all']:
+            products = products.filter(product_description_html='')
+
+        servers = set()
+        last_id = 0
+        while True:
+            batch = list(products.filter(id__gt=last_id).order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for product in batch:
+                description_html = sanitize_description(product.product_description)
+                if description_html != product.product_description_html:
+                    product.product_description_html = description_html
+                    changed.append(product)
+                    servers.add(product.server_id)
+            Product.objects.bulk_update(changed, ['product_description_html'])
+
+        # Strony sklepów z nowymi opisami muszą zostać wyrenderowane od nowa
+        Server.objects.filter(id__in=servers).update(content_version=F('content_version') + 1,
+                                                     content_updated=timezone.now())
+        self.stdout.write(f'Zaktualizowano opisy produktów na {len(servers)} serwerach.')
@@ -0,0 +1,99 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:21
+
+import ckeditor.fields
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=100)),
+                ('product_description', ckeditor.fields.RichTextField(max_length=200)),
+                ('product_commands', models.CharField(max_length=2000)),
+                ('product_image', models.URLField(blank=True, default='')),
+                ('lvlup_other_price', models.CharField(blank=True, max_length=10, null=True)),
+                ('lvlup_sms_number', models.IntegerField(blank=True, null=True)),
+                ('microsms_sms_number', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Server',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('server_name', models.CharField(max_length=16)),
+                ('server_ip', models.CharField(max_length=32)),
+                ('rcon_password', models.CharField(max_length=100)),
+                ('rcon_port', models.IntegerField()),
+                ('owner_id', models.IntegerField()),
+                ('server_version', models.CharField(max_length=50)),
+                ('server_status', models.BooleanField(default=True)),
+                ('server_players', models.CharField(max_length=10)),
+                ('logo', models.URLField(blank=True)),
+                ('own_css', models.URLField(blank=True)),
+                ('shop_style', models.CharField(default='light', max_length=5)),
+                ('discord_webhook', models.URLField(blank=True)),
+                ('admins', models.TextField(blank=True, default=' ', null=True)),
+                ('domain', models.CharField(blank=True, default=' ', max_length=64, null=True)),
+                ('rcon_status', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Voucher',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=32)),
+                ('player', models.CharField(max_length=16)),
+                ('status', models.BooleanField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ServerNavbarLink',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=16)),
+                ('url', models.URLField()),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Purchase',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('buyer', models.CharField(max_length=32)),
+                ('lvlup_id', models.CharField(max_length=16)),
+                ('status', models.IntegerField()),
+                ('date', models.DateTimeField(blank=True, default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Product')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='server',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server'),
+        ),
+        migrations.CreateModel(
+            name='PaymentOperator',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operator_name', models.CharField(max_length=20)),
+                ('operator_type', models.CharField(max_length=20)),
+                ('client_id', models.IntegerField(blank=True, null=True)),
+                ('api_key', models.CharField(blank=True, max_length=64, null=True)),
+                ('service_id', models.IntegerField(blank=True, null=True)),
+                ('sms_content', models.CharField(blank=True, max_length=16, null=True)),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('buyer', models.CharField(max_length=32)),
+                ('commands', models.CharField(max_length=2000)),
+                ('status', models.IntegerField(default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.CharField(blank=True, default='', max_length=200)),
+                ('date', models.DateTimeField(blank=True, default=django.utils.timezone.now)),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='shop.Purchase')),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+                ('voucher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='shop.Voucher')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_deliveryjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerLock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('owner', models.CharField(max_length=64)),
+                ('expires', models.DateTimeField()),
+            ],
+        ),
+    ]
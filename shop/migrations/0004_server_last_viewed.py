@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_workerlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='last_viewed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
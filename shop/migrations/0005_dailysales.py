@@ -0,0 +1,29 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_server_last_viewed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('operator', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Product')),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+            ],
+            options={
+                'unique_together': {('server', 'product', 'day', 'operator')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_dailysales'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='server',
+            name='owner_id',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ServerAdmin',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(db_index=True, max_length=32)),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+            ],
+            options={
+                'unique_together': {('server', 'user_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+# Przepisuje id użytkowników z pola Server.admins (po przecinku) do tabeli ServerAdmin
+def copy_server_admins(apps, schema_editor):
+    Server = apps.get_model('shop', 'Server')
+    ServerAdmin = apps.get_model('shop', 'ServerAdmin')
+
+    admins = []
+    for server_id, server_admins in Server.objects.values_list('id', 'admins').iterator():
+        user_ids = {user_id.strip() for user_id in (server_admins or '').split(',') if user_id.strip()}
+        admins += [ServerAdmin(server_id=server_id, user_id=user_id) for user_id in user_ids]
+    ServerAdmin.objects.bulk_create(admins, batch_size=1000)
+
+
+def remove_server_admins(apps, schema_editor):
+    apps.get_model('shop', 'ServerAdmin').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_serveradmin'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_server_admins, remove_server_admins),
+    ]
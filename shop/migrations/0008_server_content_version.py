@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_copy_server_admins'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='content_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
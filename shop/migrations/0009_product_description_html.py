@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_server_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='product_description_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_server_content_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscordNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('buyer', models.CharField(max_length=32)),
+                ('product_name', models.CharField(max_length=100)),
+                ('status', models.IntegerField(default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.CharField(blank=True, default='', max_length=200)),
+                ('date', models.DateTimeField(blank=True, default=django.utils.timezone.now)),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='discordnotification',
+            index=models.Index(fields=['status', 'next_attempt'], name='shop_discor_status_c57598_idx'),
+        ),
+    ]
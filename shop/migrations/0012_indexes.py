@@ -0,0 +1,52 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+# Przed dodaniem ograniczenia zostaje tylko najstarszy operator danego typu na serwerze
+def remove_duplicate_operators(apps, schema_editor):
+    PaymentOperator = apps.get_model('shop', 'PaymentOperator')
+    keep = PaymentOperator.objects.values('server_id', 'operator_type').annotate(first_id=Min('id')).values_list(
+        'first_id', flat=True)
+    PaymentOperator.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_discordnotification'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='server',
+            name='domain',
+            field=models.CharField(blank=True, db_index=True, default=' ', max_length=64, null=True),
+        ),
+        migrations.RunPython(remove_duplicate_operators, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='paymentoperator',
+            unique_together={('server', 'operator_type')},
+        ),
+        migrations.AddIndex(
+            model_name='deliveryjob',
+            index=models.Index(fields=['status', 'next_attempt'], name='deliveryjob_status_next_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['lvlup_id', 'status'], name='purchase_lvlup_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['product', 'status', 'date'], name='purchase_product_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['status', 'date'], name='purchase_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['code', 'status'], name='voucher_code_status_idx'),
+        ),
+    ]
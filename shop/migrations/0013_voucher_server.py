@@ -0,0 +1,76 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:36
+
+import random
+import string
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_voucher_server(apps, schema_editor):
+    Voucher = apps.get_model('shop', 'Voucher')
+    Product = apps.get_model('shop', 'Product')
+    Voucher.objects.update(server_id=models.Subquery(
+        Product.objects.filter(id=models.OuterRef('product_id')).values('server_id')[:1]))
+
+
+# Kod zostaje przy najstarszym niewykorzystanym voucherze, bo gracz może go jeszcze wpisać.
+# Gdy wszystkie są wykorzystane, zostaje przy najstarszym.
+def code_owner(vouchers):
+    unused = [voucher for voucher in vouchers if voucher.status == 0]
+    return (unused or vouchers)[0]
+
+
+# Powtórzone kody na jednym serwerze dostają nowy losowy kod, zmienione vouchery są wypisywane,
+# żeby właściciele serwerów mogli przekazać nowe kody graczom
+def remove_duplicate_codes(apps, schema_editor):
+    Voucher = apps.get_model('shop', 'Voucher')
+    duplicates = Voucher.objects.values('server_id', 'code').annotate(count=models.Count('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        vouchers = list(Voucher.objects.filter(server_id=duplicate['server_id'], code=duplicate['code']).order_by('id'))
+        owner = code_owner(vouchers)
+        for voucher in vouchers:
+            if voucher is owner:
+                continue
+            while True:
+                code = ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+                if not Voucher.objects.filter(server_id=voucher.server_id, code=code).exists():
+                    break
+            Voucher.objects.filter(id=voucher.id).update(code=code)
+            print('\n  Voucher %d (serwer %d, status %d): kod %s zmieniony na %s'
+                  % (voucher.id, voucher.server_id, voucher.status, voucher.code, code))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='voucher',
+            name='voucher_code_status_idx',
+        ),
+        migrations.AlterField(
+            model_name='voucher',
+            name='status',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='voucher',
+            name='server',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='shop.Server'),
+        ),
+        migrations.RunPython(fill_voucher_server, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='voucher',
+            name='server',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='voucher',
+            unique_together={('code', 'server')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_voucher_server'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoucherBatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField()),
+                ('date', models.DateTimeField(blank=True, default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Product')),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.Server')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='voucher',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='shop.VoucherBatch'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_voucherbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='status_updated',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
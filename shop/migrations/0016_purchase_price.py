@@ -0,0 +1,47 @@
+# Generated by Django 3.0.7 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+from shop.utils.prices import product_price, purchase_operator
+
+
+# Starsze zakupy dostają cenę produktu z chwili migracji, bo zapłacona kwota nie była zapisywana
+def fill_purchase_price(apps, schema_editor):
+    Purchase = apps.get_model('shop', 'Purchase')
+    purchases = Purchase.objects.select_related('product').only(
+        'id', 'lvlup_id', 'product__lvlup_other_price', 'product__lvlup_sms_number', 'product__microsms_sms_number')
+
+    batch = []
+    for purchase in purchases.iterator(chunk_size=1000):
+        product = purchase.product
+        purchase.operator = purchase_operator(purchase.lvlup_id)
+        purchase.price = product_price(purchase.operator, product.lvlup_other_price, product.lvlup_sms_number,
+                                       product.microsms_sms_number)
+        batch.append(purchase)
+        if len(batch) == 1000:
+            Purchase.objects.bulk_update(batch, ['operator', 'price'])
+            batch = []
+    Purchase.objects.bulk_update(batch, ['operator', 'price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_server_status_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='operator',
+            field=models.CharField(default='lvlup_other', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_purchase_price, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import hashlib
+
 from django.db import models
 from django.utils import timezone
 from ckeditor.fields import RichTextField
@@ -8,7 +10,7 @@ class Server(models.Model):
     server_ip = models.CharField(max_length=32)
     rcon_password = models.CharField(max_length=100)
     rcon_port = models.IntegerField()
-    owner_id = models.IntegerField()
+    owner_id = models.IntegerField(db_index=True)
     server_version = models.CharField(max_length=50)
     server_status = models.BooleanField(default=True)
     server_players = models.CharField(max_length=10)
@@ -17,15 +19,44 @@ class Server(models.Model):
     shop_style = models.CharField(max_length=5, default="light")
     discord_webhook = models.URLField(blank=True)
     admins = models.TextField(blank=True, null=True, default=" ")  # Osoby mające dostęp do itemshopu (wymienione id discord użytkowników po przecinku)
-    domain = models.CharField(blank=True, null=True, max_length=64, default=" ")
+    domain = models.CharField(blank=True, null=True, max_length=64, default=" ", db_index=True)
     rcon_status = models.BooleanField(default=True)
+    last_viewed = models.DateTimeField(blank=True, null=True)  # Ostatnie wejście na sklep lub panel, odświeżane najwyżej co minutę
+    content_version = models.IntegerField(default=0)  # Zwiększane przy każdej zmianie tego, co widać w sklepie i w api (shop/utils/page_cache.py)
+    content_updated = models.DateTimeField(default=timezone.now)  # Czas ostatniej zmiany content_version, do nagłówka Last-Modified
+    status_updated = models.DateTimeField(default=timezone.now)  # Czas ostatniej zmiany statusu, wersji lub liczby graczy, tylko dla listy serwerów w api
+
+    # None, jeśli serwer nie istnieje, w przeciwnym razie czy użytkownik jest właścicielem lub administratorem
+    def user_has_access(server_id, user_id):
+        is_admin = ServerAdmin.objects.filter(server_id=models.OuterRef('pk'), user_id=str(user_id))
+        server = Server.objects.filter(id=server_id).annotate(is_admin=models.Exists(is_admin)).values(
+            'owner_id', 'is_admin')
+        if not server:
+            return None
+        return server[0]['is_admin'] or str(server[0]['owner_id']) == str(user_id)
 
-    def get_admins(server_id):
+    # Serwery, którymi użytkownik zarządza jako właściciel lub administrator
+    def managed_by(user_id):
+        admin_of = ServerAdmin.objects.filter(user_id=str(user_id)).values('server_id')
         try:
-            admins = Server.objects.filter(id=server_id).values('admins')[0]['admins'].split(',')
-        except:
-            admins = []
-        return admins
+            owned = models.Q(owner_id=int(user_id))
+        except ValueError:
+            owned = models.Q(pk__in=[])
+        return Server.objects.filter(owned | models.Q(id__in=admin_of))
+
+
+"""
+Administratorzy serwera, wypełniane z pola Server.admins przy zapisie ustawień.
+Indeks po user_id pozwala pobrać serwery użytkownika bez przeglądania wszystkich serwerów.
+"""
+
+
+class ServerAdmin(models.Model):
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    user_id = models.CharField(max_length=32, db_index=True)  # Id użytkownika discord
+
+    class Meta:
+        unique_together = ('server', 'user_id')
 
 
 """
@@ -49,10 +80,14 @@ class PaymentOperator(models.Model):
     service_id = models.IntegerField(blank=True, null=True)
     sms_content = models.CharField(max_length=16, blank=True, null=True)
 
+    class Meta:
+        unique_together = ('server', 'operator_type')  # Jeden operator danego typu na serwer
+
 
 class Product(models.Model):
     product_name = models.CharField(max_length=100)
     product_description = RichTextField(max_length=200)
+    product_description_html = models.TextField(blank=True, default="")  # Oczyszczony opis gotowy do wyświetlenia w sklepie
     server = models.ForeignKey(Server, on_delete=models.CASCADE)
     product_commands = models.CharField(max_length=2000)
     product_image = models.URLField(blank=True, default="")
@@ -61,6 +96,20 @@ class Product(models.Model):
     lvlup_sms_number = models.IntegerField(blank=True, null=True)
     microsms_sms_number = models.IntegerField(blank=True, null=True)
 
+    # Część adresu /image/product/<id>/, która zmienia się razem ze zdjęciem, więc przeglądarka nie pokaże starego
+    @property
+    def image_version(self):
+        return hashlib.md5(self.product_image.encode('utf8')).hexdigest()[:8]
+
+
+"""
+Statusy zakupu:
+- 0 - oczekuje na płatność
+- 1 - opłacony i dostarczony
+- 2 - opłacony, komendy czekają w kolejce na wysłanie
+- 3 - opłacony, nie udało się wysłać komend
+"""
+
 
 class Purchase(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -68,16 +117,122 @@ class Purchase(models.Model):
     lvlup_id = models.CharField(max_length=16)
     status = models.IntegerField()
     date = models.DateTimeField(default=timezone.now, blank=True)
+    # Operator i zapłacona kwota z chwili zakupu, cena produktu może się później zmienić
+    operator = models.CharField(max_length=20)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lvlup_id', 'status'], name='purchase_lvlup_status_idx'),  # Webhook lvlup
+            models.Index(fields=['product', 'status', 'date'], name='purchase_product_status_idx'),  # Sklep i panel
+            models.Index(fields=['status', 'date'], name='purchase_status_date_idx'),  # Statystyki
+        ]
+
+
+"""
+Dzienne podsumowanie sprzedaży (shop/utils/stats.py), jeden wiersz na serwer, produkt, dzień i operatora.
+Uzupełniane przy dostarczeniu zakupu, od zera przelicza je python manage.py rebuild_sales_stats.
+"""
+
+
+class DailySales(models.Model):
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    day = models.DateField()
+    operator = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('server', 'product', 'day', 'operator')
+
+
+"""
+Statusy vouchera:
+- 0 - do wykorzystania
+- 1 - wykorzystany, komendy zostały wysłane
+- 2 - zajęty przez gracza, komendy czekają w kolejce (shop/utils/delivery.py)
+"""
+
+
+# Vouchery wygenerowane hurtowo (np. na konkurs), do pobrania z panelu jako CSV lub NDJSON (shop/utils/vouchers.py)
+class VoucherBatch(models.Model):
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    count = models.IntegerField()
+    date = models.DateTimeField(default=timezone.now, blank=True)
 
 
 class Voucher(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)  # Kopia product.server, kod jest szukany po (code, server)
+    batch = models.ForeignKey(VoucherBatch, on_delete=models.CASCADE, blank=True, null=True)
     code = models.CharField(max_length=32)
     player = models.CharField(max_length=16)
-    status = models.BooleanField()
+    status = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('code', 'server')
 
 
 class ServerNavbarLink(models.Model):
     server = models.ForeignKey(Server, on_delete=models.CASCADE)
     name = models.CharField(max_length=16)
     url = models.URLField()
+
+
+"""
+Kolejka komend do wysłania przez rcon (shop/utils/delivery.py).
+Statusy zadania:
+- 0 - czeka na wysłanie
+- 1 - wysłane
+- 2 - nie udało się wysłać po DELIVERY_MAX_ATTEMPTS próbach
+- 3 - w trakcie wysyłania
+"""
+
+
+class DeliveryJob(models.Model):
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, blank=True, null=True)
+    voucher = models.ForeignKey(Voucher, on_delete=models.CASCADE, blank=True, null=True)
+    buyer = models.CharField(max_length=32)
+    commands = models.CharField(max_length=2000)
+    status = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.CharField(max_length=200, blank=True, default="")
+    date = models.DateTimeField(default=timezone.now, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt'], name='deliveryjob_status_next_idx')]
+
+
+"""
+Kolejka powiadomień o zakupach na webhook Discorda (shop/utils/notifications.py).
+Statusy powiadomienia:
+- 0 - czeka na wysłanie
+- 1 - wysłane
+- 2 - nie udało się wysłać
+"""
+
+
+class DiscordNotification(models.Model):
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    buyer = models.CharField(max_length=32)
+    product_name = models.CharField(max_length=100)
+    status = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.CharField(max_length=200, blank=True, default="")
+    date = models.DateTimeField(default=timezone.now, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt'])]
+
+
+# Blokada, dzięki której tylko jeden proces run_worker wykonuje zadania okresowe (shop/utils/worker.py)
+class WorkerLock(models.Model):
+    name = models.CharField(max_length=32, unique=True)
+    owner = models.CharField(max_length=64)
+    expires = models.DateTimeField()
@@ -1 +1,1273 @@
-from django.test import TestCase
\ No newline at end of file
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+import requests
+from PIL import Image
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+from django.utils import timezone
+
+from shop.models import Server, Product, Purchase, Voucher, DailySales, ServerNavbarLink, DiscordNotification, \
+    PaymentOperator, DeliveryJob, ServerAdmin
+from shop.utils import delivery, server_status
+from shop.utils.delivery import enqueue_delivery, process_delivery_jobs, claim_delivery_jobs, retry_delay
+from shop.utils.domains import DomainRoutes
+from shop.utils.http import HttpClient, metrics
+from shop.utils.images import ImageCache, ImageError, get_thumbnail, image_cache
+from shop.utils.notifications import DiscordNotifier, enqueue_notification
+from shop.utils.page_cache import touch_server
+from shop.utils.prices import product_price, purchase_operator
+from shop.utils.purchases import load_product_context, load_purchase_context
+from shop.views import avatar, use_voucher, export_vouchers, export_purchases, sales_statistics, \
+    customize_website
+from shop.utils.static_files import serve_static
+from shop.utils.functions import parse_admins, set_server_admins
+from shop.utils.functions import check_rcon_connection_async, send_commands_async
+from shop.utils.rcon import RconClient, AsyncRconClient, RconAuthError, RconBatchError, encode_packet
+from shop.utils.rcon_health import RconHealthChecker
+from shop.utils.rcon_pool import RconPool
+from shop.utils.stats import rebuild_daily_sales, sales_stats
+from shop.utils.vouchers import generate_voucher_batch
+from shop.utils.worker import Job, Worker
+from shop.utils.server_list_ping import ping, ping_servers, resolve_srv, encode_varint, encode_dns_name
+
+
+# Lokalny serwer TCP do testów, działa na własnej pętli asyncio w osobnym wątku
+class LocalServer(object):
+    def __init__(self):
+        self.writers = []
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.port = None
+
+    def start(self):
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.accept, '127.0.0.1', 0))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self):
+        async def shutdown():
+            self.server.close()
+            for writer in self.writers:
+                writer.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def accept(self, reader, writer):
+        self.writers.append(writer)
+        try:
+            await self.handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+"""
+Serwer rcon do testów. Z lossy=True, jak starsze wersje Minecrafta (MC-72390), obsługuje tylko pierwszy
+pakiet z każdego odczytu. close_after zamyka połączenie po tylu komendach, a drop_sentinel zamyka je
+zamiast odpowiedzieć na znacznik. Z late_reply serwer odpowiada na pierwszą paczkę komend po tylu sekundach.
+"""
+
+
+class FakeRconServer(LocalServer):
+    def __init__(self, password='secret', responses=None, silent=False, lossy=False, close_after=None,
+                 drop_sentinel=False, late_reply=0):
+        super().__init__()
+        self.password = password
+        self.responses = responses or {}
+        self.silent = silent
+        self.lossy = lossy
+        self.close_after = close_after
+        self.drop_sentinel = drop_sentinel
+        self.late_reply = late_reply
+        self.commands = []
+
+    async def handle(self, reader, writer):
+        buffer = b''
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            buffer += data
+            packets = []
+            while len(buffer) >= 4:
+                (length,) = struct.unpack('<i', buffer[:4])
+                if len(buffer) < 4 + length:
+                    break
+                packets.append(buffer[4:4 + length])
+                buffer = buffer[4 + length:]
+            if self.lossy:
+                packets, buffer = packets[:1], b''
+            if self.late_reply and any(struct.unpack('<i', packet[4:8])[0] == 2 for packet in packets):
+                await asyncio.sleep(self.late_reply)
+                self.late_reply = 0
+
+            for payload in packets:
+                if not self.handle_packet(payload, writer):
+                    return
+            await writer.drain()
+
+    # Zwraca False, jeżeli serwer ma zamknąć połączenie
+    def handle_packet(self, payload, writer):
+        request_id, packet_type = struct.unpack('<ii', payload[:8])
+        body = payload[8:-2].decode('utf8')
+
+        if packet_type == 3:
+            writer.write(encode_packet(request_id if body == self.password else -1, 2, ''))
+        elif packet_type == 2:
+            if self.close_after is not None and len(self.commands) >= self.close_after:
+                return False
+            self.commands.append(body)
+            if self.silent:
+                return True
+            response = self.responses.get(body, 'ok ' + body)
+            for i in range(0, max(len(response), 1), 4096):
+                writer.write(encode_packet(request_id, 0, response[i:i + 4096]))
+        elif self.drop_sentinel:
+            return False
+        else:
+            writer.write(encode_packet(request_id, 0, 'Unknown request %x' % packet_type))
+        return True
+
+
+# Odpowiada na Server List Ping jak serwer 1.7+ albo, z legacy=True, jak serwer 1.6
+class FakeMinecraftServer(LocalServer):
+    def __init__(self, version='1.16.5', online=3, max_players=100, legacy=False):
+        super().__init__()
+        self.version = version
+        self.online = online
+        self.max_players = max_players
+        self.legacy = legacy
+
+    async def handle(self, reader, writer):
+        first = await reader.readexactly(1)
+        if first == b'\xfe':
+            await reader.readexactly(1)
+            data = '\x00'.join(['\xa71', '127', self.version, 'motd', str(self.online), str(self.max_players)])
+            writer.write(b'\xff' + struct.pack('>H', len(data)) + data.encode('utf-16-be'))
+            await writer.drain()
+            return
+        if self.legacy:
+            return
+
+        length = first[0]
+        await reader.readexactly(length)  # handshake
+        await reader.readexactly(2)  # zapytanie o status
+        status = json.dumps({
+            'version': {'name': self.version, 'protocol': 754},
+            'players': {'online': self.online, 'max': self.max_players},
+            'description': {'text': 'motd'}
+        }).encode('utf8')
+        data = encode_varint(0x00) + encode_varint(len(status)) + status
+        writer.write(encode_varint(len(data)) + data)
+        await writer.drain()
+
+
+# Serwer DNS odpowiadający na każde zapytanie jednym rekordem SRV
+class FakeDnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, target, port):
+        self.target = target
+        self.port = port
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        question_end = data.index(b'\x00', 12) + 5
+        answer = b'\xc0\x0c' + struct.pack('>HHIH', 33, 1, 60, 6 + len(encode_dns_name(self.target)))
+        answer += struct.pack('>HHH', 10, 5, self.port) + encode_dns_name(self.target)
+        header = data[:2] + struct.pack('>HHHHH', 0x8180, 1, 1, 0, 0)
+        self.transport.sendto(header + data[12:question_end] + answer, addr)
+
+
+class RconClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeRconServer(responses={'long': 'x' * 10000, 'bad': 'Unknown command'})
+        self.port = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_command_batch(self):
+        with RconClient('127.0.0.1', self.port, 'secret') as rcon:
+            results = rcon.command_batch(['say a', 'long', 'bad'])
+
+        self.assertEqual(self.server.commands, ['say a', 'long', 'bad'])
+        self.assertEqual(results[0].response, 'ok say a')
+        self.assertEqual(results[1].response, 'x' * 10000)
+        self.assertEqual([result.success for result in results], [True, True, False])
+
+    def test_wrong_password(self):
+        with self.assertRaises(RconAuthError):
+            RconClient('127.0.0.1', self.port, 'wrong').connect()
+
+    def test_async_command_batch(self):
+        async def run():
+            async with AsyncRconClient('127.0.0.1', self.port, 'secret') as rcon:
+                return await rcon.command_batch(['say a', 'long'])
+
+        results = asyncio.run(run())
+        self.assertEqual([result.response for result in results], ['ok say a', 'x' * 10000])
+
+    def test_async_send_commands(self):
+        results = asyncio.run(send_commands_async('127.0.0.1:25565', 'secret', ['give {PLAYER} 1'], 'Steve', self.port))
+        self.assertEqual(results[0].response, 'ok give Steve 1')
+
+    def test_async_check_rcon_connection(self):
+        self.assertTrue(asyncio.run(check_rcon_connection_async('127.0.0.1', 'secret', self.port)))
+        self.assertFalse(asyncio.run(check_rcon_connection_async('127.0.0.1', 'wrong', self.port)))
+
+
+class RconTimeoutTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeRconServer(silent=True)
+        self.port = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_async_timeout(self):
+        async def run():
+            async with AsyncRconClient('127.0.0.1', self.port, 'secret', timeout=0.2) as rcon:
+                await rcon.command_batch(['say a'])
+
+        with self.assertRaises(RconBatchError) as error:
+            asyncio.run(run())
+        self.assertFalse(error.exception.results[0].delivered)
+
+
+class RconPipeliningFallbackTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeRconServer(lossy=True)
+        self.port = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_fallback_to_single_commands(self):
+        with RconClient('127.0.0.1', self.port, 'secret', timeout=0.3) as rcon:
+            results = rcon.command_batch(['say a', 'say b', 'say c'])
+            self.assertFalse(rcon.pipelining)
+
+        self.assertEqual(self.server.commands, ['say a', 'say b', 'say c'])
+        self.assertEqual([result.response for result in results], ['ok say a', 'ok say b', 'ok say c'])
+
+    def test_late_replies_are_not_sent_again(self):
+        self.server.lossy = False
+        self.server.late_reply = 0.5
+        with RconClient('127.0.0.1', self.port, 'secret', timeout=0.3) as rcon:
+            results = rcon.command_batch(['say a', 'say b', 'say c'])
+            self.assertTrue(rcon.pipelining)
+
+        self.assertEqual(self.server.commands, ['say a', 'say b', 'say c'])
+        self.assertEqual([result.response for result in results], ['ok say a', 'ok say b', 'ok say c'])
+
+    def test_async_late_replies_are_not_sent_again(self):
+        self.server.lossy = False
+        self.server.late_reply = 0.5
+
+        async def run():
+            async with AsyncRconClient('127.0.0.1', self.port, 'secret', timeout=0.3) as rcon:
+                return await rcon.command_batch(['say a', 'say b']), rcon.pipelining
+
+        results, pipelining = asyncio.run(run())
+        self.assertTrue(pipelining)
+        self.assertEqual(self.server.commands, ['say a', 'say b'])
+        self.assertEqual([result.response for result in results], ['ok say a', 'ok say b'])
+
+    def test_async_fallback_to_single_commands(self):
+        async def run():
+            async with AsyncRconClient('127.0.0.1', self.port, 'secret', timeout=0.3) as rcon:
+                return await rcon.command_batch(['say a', 'say b']), rcon.pipelining
+
+        results, pipelining = asyncio.run(run())
+        self.assertFalse(pipelining)
+        self.assertEqual(self.server.commands, ['say a', 'say b'])
+        self.assertEqual([result.response for result in results], ['ok say a', 'ok say b'])
+
+
+class RconPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeRconServer()
+        self.port = self.server.start()
+        self.pool = RconPool(max_idle=60, health_check_after=0, timeout=1)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.server.stop()
+
+    def send(self, command, server_ip='127.0.0.1'):
+        return self.pool.send_commands(1, server_ip, 'secret', self.port, [command])[0].response
+
+    def test_connection_is_reused(self):
+        self.assertEqual(self.send('say a'), 'ok say a')
+        self.assertEqual(self.send('say b'), 'ok say b')
+        self.assertEqual(len(self.server.writers), 1)
+
+        # Zmiana adresu serwera zamyka stare połączenie
+        self.assertEqual(self.send('say c', server_ip='localhost'), 'ok say c')
+        self.assertEqual(len(self.server.writers), 2)
+
+    def test_reconnects_after_server_closed_connection(self):
+        self.send('say a')
+        self.server.loop.call_soon_threadsafe(self.server.writers[0].close)
+        time.sleep(0.1)
+
+        self.assertEqual(self.send('say b'), 'ok say b')
+        self.assertEqual(len(self.server.writers), 2)
+
+
+class WorkerTestCase(SimpleTestCase):
+    def test_demoted_leader_does_not_run_job(self):
+        calls = []
+        worker = Worker([])
+        job = Job('test', 0.3, lambda: calls.append(time.monotonic()))
+        worker.leader.set()
+        thread = threading.Thread(target=worker.run_job, args=(job,))
+        thread.start()
+
+        time.sleep(0.1)
+        worker.leader.clear()  # Blokadę przejął inny proces, zanim minął interwał zadania
+        time.sleep(0.4)
+        worker.stop()
+        worker.leader.set()
+        thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class RconHealthCheckerTestCase(TestCase):
+    def setUp(self):
+        self.rcon = FakeRconServer()
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=self.rcon.start(), owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+
+    def tearDown(self):
+        self.rcon.stop()
+
+    def status(self):
+        return Server.objects.values_list('rcon_status', 'content_version').get(id=self.server.id)
+
+    def test_status_changes_after_repeated_failures(self):
+        checker = RconHealthChecker(window=0, failure_threshold=2)
+        self.assertEqual(checker.run_once(), 0)
+
+        Server.objects.filter(id=self.server.id).update(rcon_password='wrong')
+        self.assertEqual(checker.run_once(), 0)  # Pojedynczy błąd nie zmienia statusu
+        self.assertEqual(self.status(), (True, 0))
+        self.assertEqual(checker.run_once(), 1)
+        self.assertEqual(self.status(), (False, 1))
+        self.assertEqual(checker.run_once(), 0)
+
+        Server.objects.filter(id=self.server.id).update(rcon_password='secret')
+        self.assertEqual(checker.run_once(), 1)
+        self.assertEqual(self.status(), (True, 2))
+
+
+@override_settings(SERVER_STATUS_INTERVAL=360, SERVER_STATUS_ACTIVE_INTERVAL=60, SERVER_STATUS_MAX_INTERVAL=3600)
+class ServerStatusScheduleTestCase(TestCase):
+    def test_intervals(self):
+        refresher = server_status.ServerStatusRefresher()
+        self.assertEqual(refresher.next_check_in(True, 0, recently_viewed=True), 60)
+        self.assertEqual(refresher.next_check_in(True, 0, recently_viewed=False), 360)
+        # Wyłączony serwer jest sprawdzany coraz rzadziej, chyba że ktoś ogląda jego sklep
+        self.assertEqual([refresher.next_check_in(False, failures, recently_viewed=False) for failures in range(1, 6)],
+                         [360, 720, 1440, 2880, 3600])
+        self.assertEqual(refresher.next_check_in(False, 4, recently_viewed=True), 60)
+
+    def test_failing_server_is_not_checked_until_due(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        server = Server.objects.create(server_name='test', server_ip=f'127.0.0.1:{closed.getsockname()[1]}',
+                                       rcon_password='secret', rcon_port=25575, owner_id=1,
+                                       server_version='1.16.5', server_players='0/100')
+        closed.close()
+
+        refresher = server_status.ServerStatusRefresher()
+        self.assertEqual(refresher.run_once(), 1)
+        next_check, failures = refresher.schedule[server.id]
+        self.assertEqual(failures, 1)
+        self.assertAlmostEqual(next_check - time.monotonic(), 360, delta=5)
+        self.assertFalse(Server.objects.get(id=server.id).server_status)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(refresher.run_once(), 0)
+
+
+class ServerListPingTestCase(SimpleTestCase):
+    def test_ping(self):
+        server = FakeMinecraftServer()
+        port = server.start()
+        try:
+            status = ping(f'127.0.0.1:{port}')
+        finally:
+            server.stop()
+        self.assertEqual(status, {'online': True, 'version': '1.16.5', 'players': {'online': 3, 'max': 100}})
+
+    def test_legacy_ping(self):
+        server = FakeMinecraftServer(version='1.6.4', legacy=True)
+        port = server.start()
+        try:
+            status = ping(f'127.0.0.1:{port}')
+        finally:
+            server.stop()
+        self.assertEqual(status, {'online': True, 'version': '1.6.4', 'players': {'online': 3, 'max': 100}})
+
+    def test_offline(self):
+        server = FakeMinecraftServer()
+        port = server.start()
+        server.stop()
+        self.assertEqual(ping(f'127.0.0.1:{port}', timeout=1), {'online': False})
+
+    def test_ping_servers(self):
+        servers = [FakeMinecraftServer(online=i) for i in range(20)]
+        ports = [server.start() for server in servers]
+        try:
+            statuses = asyncio.run(ping_servers([f'127.0.0.1:{port}' for port in ports], concurrency=5))
+        finally:
+            for server in servers:
+                server.stop()
+        self.assertEqual([status['players']['online'] for status in statuses], list(range(20)))
+
+    def test_resolve_srv(self):
+        async def run():
+            transport, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: FakeDnsProtocol('mc.example.com', 25577), local_addr=('127.0.0.1', 0))
+            try:
+                port = transport.get_extra_info('sockname')[1]
+                return await resolve_srv('example.com', 1, nameserver='127.0.0.1', nameserver_port=port)
+            finally:
+                transport.close()
+
+        self.assertEqual(asyncio.run(run()), ('mc.example.com', 25577))
+
+
+class PanelQueryBudgetTestCase(TestCase):
+    def setUp(self):
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=25575, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        server_status._viewed.clear()
+
+    def add_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(product_name=f'produkt {i}', product_description='opis',
+                                             server=self.server, product_commands='say {PLAYER}')
+            Purchase.objects.create(product=product, buyer='Steve', lvlup_id='lvlup_sms', status=1,
+                                    operator='lvlup_sms', price=Decimal('2.46'))
+            Purchase.objects.create(product=product, buyer='Alex', lvlup_id='lvlup_sms', status=0,
+                                    operator='lvlup_sms', price=Decimal('2.46'))
+            Voucher.objects.create(product=product, server=self.server, code=f'KOD{product.id}', player='', status=0)
+
+    def render_panel(self):
+        from shop.views import panel
+
+        request = RequestFactory().get(f'/panel/{self.server.id}/')
+        request.session = {'username': 'test', 'user_id': '1'}
+        response = panel(request, server_id=self.server.id)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_products(self):
+        self.add_products(1)
+        with self.assertNumQueries(9):
+            self.render_panel()
+
+        self.add_products(30)
+        server_status._viewed.clear()
+        with self.assertNumQueries(9):
+            self.render_panel()
+
+
+class PurchaseHistoryTestCase(TestCase):
+    def setUp(self):
+        server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                       rcon_port=25575, owner_id=1, server_version='1.16.5', server_players='0/100')
+        self.server_id = server.id
+        self.product = Product.objects.create(product_name='vip', product_description='opis', server=server,
+                                              product_commands='say {PLAYER}')
+        # Część zakupów ma identyczną datę, kolejność między nimi rozstrzyga id
+        date = timezone.now()
+        for i in range(25):
+            Purchase.objects.create(product=self.product, buyer=f'gracz{i}', lvlup_id='lvlup_sms', status=i % 2,
+                                    operator='lvlup_sms', price=Decimal('2.46'),
+                                    date=date - timezone.timedelta(minutes=i // 3))
+
+    def get_page(self, **params):
+        from shop.views import purchase_history
+
+        request = RequestFactory().get(f'/panel/{self.server_id}/purchases/', params)
+        request.session = {'username': 'test', 'user_id': '1'}
+        response = purchase_history(request, server_id=self.server_id)
+        return response.status_code, json.loads(response.content)
+
+    def test_pages_cover_all_purchases_once(self):
+        buyers = []
+        cursor = None
+        while True:
+            params = {'limit': 10}
+            if cursor:
+                params['cursor'] = cursor
+            status, page = self.get_page(**params)
+            self.assertEqual(status, 200)
+            buyers += [purchase['buyer'] for purchase in page['purchases']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        expected = Purchase.objects.order_by('-date', '-id').values_list('buyer', flat=True)
+        self.assertEqual(buyers, list(expected))
+        self.assertEqual(len(set(buyers)), 25)
+
+    def test_filters(self):
+        status, page = self.get_page(status=1, buyer='GRACZ3')
+        self.assertEqual([purchase['buyer'] for purchase in page['purchases']], ['gracz3'])
+
+    def test_invalid_cursor(self):
+        status, page = self.get_page(cursor='nie-kursor')
+        self.assertEqual(status, 400)
+
+
+class SalesStatsTestCase(TestCase):
+    def setUp(self):
+        self.rcon = FakeRconServer()
+        port = self.rcon.start()
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=port, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        self.product = Product.objects.create(product_name='vip', product_description='opis', server=self.server,
+                                              product_commands='say {PLAYER}', lvlup_other_price='10.00',
+                                              lvlup_sms_number=72068, microsms_sms_number=91400)
+
+    def tearDown(self):
+        self.rcon.stop()
+
+    def buy(self, lvlup_id):
+        operator = purchase_operator(lvlup_id)
+        price = product_price(operator, self.product.lvlup_other_price, self.product.lvlup_sms_number,
+                              self.product.microsms_sms_number)
+        purchase = Purchase.objects.create(product=self.product, buyer='Steve', lvlup_id=lvlup_id, status=2,
+                                           operator=operator, price=price)
+        enqueue_delivery(self.server.id, self.product.product_commands, 'Steve', purchase_id=purchase.id)
+
+    def test_delivery_updates_rollup(self):
+        for lvlup_id in ['lvlup_sms', 'lvlup_sms', 'microsms_sms', 'abc123']:
+            self.buy(lvlup_id)
+        process_delivery_jobs()
+
+        today = timezone.localdate()
+        stats = sales_stats(self.server.id, today, today)
+        self.assertEqual(stats['days'], [{'day': today.isoformat(), 'count': 4, 'revenue': '32.14'}])
+        self.assertEqual([(row['operator'], row['count'], row['revenue']) for row in stats['operators']],
+                         [('lvlup_other', 1, '10.00'), ('lvlup_sms', 2, '4.92'), ('microsms_sms', 1, '17.22')])
+
+        # Zmiana ceny produktu nie zmienia kwot zapłaconych wcześniej
+        Product.objects.filter(id=self.product.id).update(lvlup_other_price='99.00', lvlup_sms_number=92578)
+        incremental = set(DailySales.objects.values_list('product_id', 'day', 'operator', 'count', 'revenue'))
+        rebuild_daily_sales(self.server.id)
+        rebuilt = set(DailySales.objects.values_list('product_id', 'day', 'operator', 'count', 'revenue'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_invalid_dates(self):
+        for params, status in [({}, 200), ({'from': '2024-02-30'}, 400), ({'to': 'wczoraj'}, 400),
+                               ({'from': '2024-02-01', 'to': '2024-01-01'}, 400)]:
+            request = RequestFactory().get('/', params)
+            request.session = {'username': 'test', 'user_id': '1'}
+            self.assertEqual(sales_statistics(request, server_id=self.server.id).status_code, status)
+
+
+@override_settings(DELIVERY_RETRY_BASE=10, DELIVERY_RETRY_MAX=60, DELIVERY_MAX_ATTEMPTS=2)
+class DeliveryOutboxTestCase(TestCase):
+    def setUp(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=port, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        product = Product.objects.create(product_name='vip', product_description='opis', server=self.server,
+                                         product_commands='say {PLAYER}')
+        self.purchase = Purchase.objects.create(product=product, buyer='Steve', lvlup_id='abc', status=2,
+                                                operator='lvlup_other', price=Decimal('0'))
+        self.job = enqueue_delivery(self.server.id, product.product_commands, 'Steve', purchase_id=self.purchase.id)
+
+    def test_retry_delay_grows_up_to_limit(self):
+        self.assertEqual([retry_delay(attempts).total_seconds() for attempts in range(1, 6)], [10, 20, 40, 60, 60])
+
+    def test_gives_up_after_max_attempts(self):
+        process_delivery_jobs()
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), (0, 1))
+        self.assertAlmostEqual((self.job.next_attempt - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(process_delivery_jobs(), (0, 0))  # Jeszcze nie czas na kolejną próbę
+
+        DeliveryJob.objects.filter(id=self.job.id).update(next_attempt=timezone.now())
+        process_delivery_jobs()
+        self.job.refresh_from_db()
+        self.purchase.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), (2, 2))
+        self.assertEqual(self.purchase.status, 3)
+
+    def test_expired_lock_is_reclaimed(self):
+        now = timezone.now()
+        DeliveryJob.objects.filter(id=self.job.id).update(status=3, locked_until=now + timedelta(minutes=1))
+        self.assertEqual(claim_delivery_jobs(10), [])
+
+        # Worker, który przejął zadanie, przestał działać przed jego zakończeniem
+        DeliveryJob.objects.filter(id=self.job.id).update(locked_until=now - timedelta(seconds=1))
+        self.assertEqual(claim_delivery_jobs(10), [self.job.id])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 3)
+        self.assertGreater(self.job.locked_until, now)
+
+    def test_unreachable_server_does_not_delay_others(self):
+        others = [enqueue_delivery(self.server.id, 'say {PLAYER}', 'Alex') for _ in range(3)]
+        rcon = FakeRconServer()
+        self.addCleanup(rcon.stop)
+        working = Server.objects.create(server_name='ok', server_ip='127.0.0.1', rcon_password='secret',
+                                        rcon_port=rcon.start(), owner_id=1, server_version='1.16.5',
+                                        server_players='0/100')
+        working_job = enqueue_delivery(working.id, 'say {PLAYER}', 'Steve')
+
+        with mock.patch('shop.utils.delivery.send_commands', wraps=delivery.send_commands) as send:
+            self.assertEqual(process_delivery_jobs(), (5, 1))
+        # Jedna próba połączenia z wyłączonym serwerem, pozostałe zadania dostają ten sam błąd
+        self.assertEqual([call.args[0] for call in send.call_args_list], [self.server.id, working.id])
+        for job in [self.job] + others:
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (0, 1))
+        working_job.refresh_from_db()
+        self.assertEqual(working_job.status, 1)
+        self.assertEqual(rcon.commands, ['say Steve'])
+
+
+class DeliveryBatchErrorTestCase(TestCase):
+    def start(self, **options):
+        self.rcon = FakeRconServer(**options)
+        self.addCleanup(self.rcon.stop)
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=self.rcon.start(), owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        product = Product.objects.create(product_name='vip', product_description='opis', server=self.server,
+                                         product_commands='say a;say b')
+        self.purchase = Purchase.objects.create(product=product, buyer='Steve', lvlup_id='abc', status=2,
+                                                operator='lvlup_other', price=Decimal('0'))
+        return enqueue_delivery(self.server.id, product.product_commands, 'Steve', purchase_id=self.purchase.id)
+
+    def test_only_unacknowledged_commands_are_retried(self):
+        job = self.start(close_after=1)
+        process_delivery_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.commands), (0, 1, 'say b'))
+
+        self.rcon.close_after = None
+        DeliveryJob.objects.filter(id=job.id).update(next_attempt=timezone.now())
+        process_delivery_jobs()
+        job.refresh_from_db()
+        self.purchase.refresh_from_db()
+        self.assertEqual(job.status, 1)
+        self.assertEqual(self.purchase.status, 1)
+        self.assertEqual(self.rcon.commands, ['say a', 'say b'])
+
+    def test_acknowledged_batch_is_not_sent_again(self):
+        job = self.start(drop_sentinel=True)
+        process_delivery_jobs()
+        job.refresh_from_db()
+        self.purchase.refresh_from_db()
+        self.assertEqual((job.status, job.commands), (1, 'say a;say b'))
+        self.assertEqual(self.purchase.status, 1)
+        self.assertEqual(self.rcon.commands, ['say a', 'say b'])
+
+
+class ProductPriceTestCase(SimpleTestCase):
+    def test_transfer_price(self):
+        self.assertEqual(product_price('lvlup_other', '14.99', None, None), Decimal('14.99'))
+        self.assertEqual(product_price('lvlup_other', ' 14,99 ', None, None), Decimal('14.99'))
+        self.assertEqual(product_price('lvlup_other', None, None, None), Decimal('0'))
+        with self.assertLogs('shop.utils.prices', 'WARNING'):
+            self.assertEqual(product_price('lvlup_other', '14 zł', None, None), Decimal('0'))
+        with self.assertLogs('shop.utils.prices', 'WARNING'):
+            self.assertEqual(product_price('lvlup_other', 'NaN', None, None), Decimal('0'))
+        self.assertEqual(product_price('lvlup_sms', '14.99', 72068, None), Decimal('2.46'))
+
+
+class ServerAdminTestCase(TestCase):
+    def create_server(self, owner_id):
+        return Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                     rcon_port=25575, owner_id=owner_id, server_version='1.16.5',
+                                     server_players='0/100')
+
+    def test_access(self):
+        owned = self.create_server(1)
+        managed = self.create_server(2)
+        self.create_server(3)
+        set_server_admins(managed.id, '1,5')
+
+        self.assertEqual(set(Server.managed_by('1')), {owned, managed})
+        self.assertEqual(list(Server.managed_by('5')), [managed])
+        self.assertTrue(Server.user_has_access(managed.id, '5'))
+        self.assertFalse(Server.user_has_access(owned.id, '5'))
+        self.assertIsNone(Server.user_has_access(0, '5'))
+
+        set_server_admins(managed.id, '5')
+        self.assertEqual(list(Server.managed_by('1')), [owned])
+
+    def test_invalid_ids_are_rejected(self):
+        long_id = '1' * 33
+        self.assertEqual(parse_admins(f'123, abc,,{long_id},１２,456'), ({'123', '456'}, ['abc', long_id, '１２']))
+
+        server = self.create_server(1)
+        request = RequestFactory().post('/', {'server_id': server.id, 'admins': f'123,{long_id}'})
+        request.session = {'username': 'test', 'user_id': '1'}
+        response = customize_website(request)
+        self.assertEqual(response.status_code, 406)
+        self.assertIn(long_id, json.loads(response.content)['message'])
+        self.assertFalse(ServerAdmin.objects.filter(server=server).exists())
+
+
+class DomainRoutesTestCase(TestCase):
+    def test_resolve_and_invalidate(self):
+        server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                       rcon_port=25575, owner_id=1, server_version='1.16.5',
+                                       server_players='0/100', domain='Sklep.Example.com')
+        routes = DomainRoutes(max_age=60, check_interval=0)
+        self.assertEqual(routes.resolve('sklep.example.com'), server.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(routes.resolve('sklep.example.com'), server.id)
+            self.assertIsNone(routes.resolve('inny.example.com'))
+
+        Server.objects.filter(id=server.id).update(domain='inny.example.com')
+        DomainRoutes(max_age=60, check_interval=0).invalidate()
+        self.assertEqual(routes.resolve('inny.example.com'), server.id)
+        self.assertIsNone(routes.resolve('sklep.example.com'))
+
+
+class ShopPageCacheTestCase(TestCase):
+    def setUp(self):
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=25575, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        Product.objects.create(product_name='vip', product_description='opis', server=self.server,
+                               product_commands='say {PLAYER}')
+
+    def get_shop(self, **headers):
+        from shop.views import shop
+
+        return shop(RequestFactory().get(f'/shop/{self.server.id}/', **headers), server_id=self.server.id)
+
+    def render_shop(self):
+        response = self.get_shop()
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode('utf8')
+
+    def test_cached_until_content_changes(self):
+        self.render_shop()
+        with self.assertNumQueries(1):
+            self.render_shop()
+
+        ServerNavbarLink.objects.create(server=self.server, name='forum', url='https://example.com/forum')
+        self.assertNotIn('https://example.com/forum', self.render_shop())
+        touch_server(self.server.id)
+        self.assertIn('https://example.com/forum', self.render_shop())
+
+    def test_conditional_requests(self):
+        response = self.get_shop()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get_shop(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get_shop(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        touch_server(self.server.id)
+        response = self.get_shop(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_api(self):
+        from shop.api.viewsets import ServersViewSet
+
+        view = ServersViewSet.as_view({'get': 'list'})
+        response = view(RequestFactory().get('/api/servers/'))
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = view(RequestFactory().get('/api/servers/', HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(response.status_code, 304)
+
+    def test_status_refresh_keeps_shop_page(self):
+        from shop.api.viewsets import ServersViewSet
+
+        minecraft = FakeMinecraftServer(online=7)
+        Server.objects.filter(id=self.server.id).update(server_ip=f'127.0.0.1:{minecraft.start()}')
+        self.addCleanup(minecraft.stop)
+        view = ServersViewSet.as_view({'get': 'list'})
+        shop_etag = self.get_shop()['ETag']
+        api_etag = view(RequestFactory().get('/api/servers/'))['ETag']
+
+        self.assertEqual(server_status.ServerStatusRefresher().run_once(), 1)
+        self.assertEqual(Server.objects.get(id=self.server.id).server_players, '7/100')
+        self.assertEqual(self.get_shop(HTTP_IF_NONE_MATCH=shop_etag).status_code, 304)
+        self.assertEqual(view(RequestFactory().get('/api/servers/', HTTP_IF_NONE_MATCH=api_etag)).status_code, 200)
+
+
+class SanitizeDescriptionsTestCase(TestCase):
+    def setUp(self):
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=25575, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        description = '<p onclick="x()">ok</p><script>alert(1)</script><b>b</b>'
+        self.missing = Product.objects.create(product_name='vip', product_description=description,
+                                              server=self.server, product_commands='say {PLAYER}')
+        self.stale = Product.objects.create(product_name='svip', product_description=description,
+                                            server=self.server, product_commands='say {PLAYER}',
+                                            product_description_html='stary opis')
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command('sanitize_descriptions', *args, stdout=out)
+        self.missing.refresh_from_db()
+        self.stale.refresh_from_db()
+        self.server.refresh_from_db()
+        return out.getvalue()
+
+    def test_fills_missing_descriptions(self):
+        self.assertIn('na 1 serwerach', self.run_command('--batch-size', '1'))
+        self.assertEqual(self.missing.product_description_html, '<p>ok</p>alert(1)b')
+        self.assertEqual(self.stale.product_description_html, 'stary opis')
+        self.assertEqual(self.server.content_version, 1)
+
+        self.run_command('--all')
+        self.assertEqual(self.stale.product_description_html, '<p>ok</p>alert(1)b')
+        self.assertEqual(self.server.content_version, 2)
+
+
+class StaticFilesTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.content = b'body { color: red; }' * 50
+        os.makedirs(os.path.join(self.directory.name, 'css'))
+        for name, content in [('css/styles.css', self.content), ('css/styles.0123456789ab.css', self.content),
+                              ('css/styles.0123456789ab.css.gz', gzip.compress(self.content))]:
+            with open(os.path.join(self.directory.name, name), 'wb') as f:
+                f.write(content)
+        with open(os.path.join(self.directory.name, 'staticfiles.json'), 'w') as f:
+            json.dump({'paths': {'css/styles.css': 'css/styles.0123456789ab.css'}}, f)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get(self, path, **headers):
+        with override_settings(STATIC_ROOT=self.directory.name):
+            return serve_static(RequestFactory().get('/static/' + path, **headers), path)
+
+    def test_serves_compressed_variant(self):
+        response = self.get('css/styles.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.content)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_serves_identity(self):
+        response = self.get('css/styles.css', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+
+class ImageProxyTestCase(SimpleTestCase):
+    def setUp(self):
+        image = io.BytesIO()
+        Image.new('RGB', (300, 300), (200, 30, 30)).save(image, 'PNG')
+        requests = self.requests = []
+        hosts = self.hosts = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                hosts.append(self.headers['Host'])
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.end_headers()
+                self.wfile.write(image.getvalue())
+
+            def log_message(self, *args):
+                pass
+
+        self.http_server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_directory = image_cache.directory
+        image_cache.directory = self.directory.name
+
+    def tearDown(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        image_cache.directory = self.old_directory
+        self.directory.cleanup()
+
+    def test_avatar_is_fetched_once(self):
+        url = f'http://127.0.0.1:{self.http_server.server_port}/avatar/{{player}}/{{size}}'
+        with override_settings(AVATAR_URL=url, IMAGE_PROXY_ALLOW_PRIVATE=True):
+            for _ in range(2):
+                response = avatar(RequestFactory().get('/'), 'Steve', 40)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.requests, ['/avatar/Steve/40'])
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(io.BytesIO(response.content)).size, (40, 40))
+
+    def test_private_addresses_are_not_fetched(self):
+        url = f'http://127.0.0.1:{self.http_server.server_port}/avatar/{{player}}/{{size}}'
+        with override_settings(AVATAR_URL=url):
+            response = avatar(RequestFactory().get('/'), 'Steve', 40)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.requests, [])
+
+    # Nazwa jest rozwiązywana raz, a połączenie idzie na sprawdzony adres
+    def fake_dns(self, address):
+        lookups = []
+        getaddrinfo = socket.getaddrinfo
+
+        def resolve(host, *args, **kwargs):
+            if host == 'images.example.com':
+                lookups.append(host)
+                host = address
+            return getaddrinfo(host, *args, **kwargs)
+        return mock.patch('socket.getaddrinfo', resolve), lookups
+
+    def test_connects_to_checked_address(self):
+        patch, lookups = self.fake_dns('127.0.0.1')
+        url = f'http://images.example.com:{self.http_server.server_port}/image.png'
+        with patch, override_settings(IMAGE_PROXY_ALLOW_PRIVATE=True):
+            data, mime_type = get_thumbnail(url, 100, 100)
+        self.assertEqual(lookups, ['images.example.com'])
+        self.assertEqual(self.hosts, [f'images.example.com:{self.http_server.server_port}'])
+
+        patch, lookups = self.fake_dns('127.0.0.1')
+        with patch, self.assertRaises(ImageError):
+            get_thumbnail(url.replace('image.png', 'other.png'), 100, 100)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_product_image_url_changes_with_image(self):
+        first = Product(product_image='https://example.com/a.png').image_version
+        self.assertEqual(first, Product(product_image='https://example.com/a.png').image_version)
+        self.assertNotEqual(first, Product(product_image='https://example.com/b.png').image_version)
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = ImageCache(self.directory.name, 2500)
+        for key in ('a', 'b'):
+            cache.set(key, b'x' * 1000)
+            os.utime(cache.path(key), (1, 1 if key == 'a' else 2))
+        cache.set('c', b'x' * 1000)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+class HttpClientTestCase(SimpleTestCase):
+    def setUp(self):
+        requests_log = self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                requests_log.append((self.path, self.client_address[1]))
+                if self.path == '/slow':
+                    time.sleep(0.5)
+                try:
+                    self.send_response(503 if self.path == '/error' else 200)
+                    self.send_header('Content-Length', '2')
+                    self.end_headers()
+                    self.wfile.write(b'ok')
+                except ConnectionError:
+                    pass  # Klient przestał czekać po przekroczeniu limitu czasu
+
+            def log_message(self, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.http_server.server_port}'
+        metrics.reset()
+
+    def tearDown(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def test_connection_is_reused(self):
+        client = HttpClient('test', timeout=(1, 1))
+        for _ in range(3):
+            self.assertEqual(client.get(self.url + '/').text, 'ok')
+        self.assertEqual(len({port for path, port in self.requests}), 1)
+        self.assertEqual(metrics.snapshot()['test']['count'], 3)
+
+    def test_read_timeout_is_not_retried(self):
+        client = HttpClient('test', timeout=(1, 0.1), retries=2, status_retries=2, backoff=0)
+        with self.assertRaises(requests.Timeout):
+            client.get(self.url + '/slow')
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(metrics.snapshot()['test']['errors'], 1)
+
+    def test_server_errors_are_retried(self):
+        client = HttpClient('test', timeout=(1, 1), status_retries=2, backoff=0)
+        self.assertEqual(client.get(self.url + '/error').status_code, 503)
+        self.assertEqual(len(self.requests), 3)
+
+
+class DiscordNotificationTestCase(TestCase):
+    def setUp(self):
+        messages = self.messages = []
+        responses = self.responses = [429]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status = responses.pop(0) if responses else 204
+                if status == 204:
+                    messages.append(body['embeds'])
+                self.send_response(status)
+                self.send_header('X-RateLimit-Bucket', 'webhook')
+                if status == 429:
+                    self.send_header('Retry-After', '0.2')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.http_server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        self.server = Server.objects.create(server_name='Test', server_ip='127.0.0.1', rcon_password='x',
+                                            rcon_port=25575, owner_id=1,
+                                            discord_webhook=f'http://127.0.0.1:{self.http_server.server_port}/')
+
+    def tearDown(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def test_notifications_are_batched_and_rate_limited(self):
+        for i in range(12):
+            enqueue_notification(self.server.id, f'Gracz{i}', 'VIP')
+        notifier = DiscordNotifier(window=0)
+
+        self.assertEqual(notifier.run_once(), 0)
+        self.assertEqual(self.responses, [])
+        self.assertEqual(notifier.run_once(), 0)
+
+        time.sleep(0.25)
+        self.assertEqual(notifier.run_once(), 2)
+        self.assertEqual([len(embeds) for embeds in self.messages], [10, 2])
+        self.assertEqual(DiscordNotification.objects.filter(status=1, attempts=1).count(), 12)
+
+    def test_waits_for_more_purchases(self):
+        enqueue_notification(self.server.id, 'Gracz', 'VIP')
+        self.assertEqual(DiscordNotifier(window=60).run_once(), 0)
+        self.assertEqual(DiscordNotification.objects.filter(status=0).count(), 1)
+
+
+class QueryPlanTestCase(TestCase):
+    def assertUsesIndex(self, queryset, expected):
+        plan = queryset.explain()
+        self.assertIn('USING', plan)
+        self.assertIn(expected, plan)
+
+    def test_hot_lookups_use_indexes(self):
+        self.assertUsesIndex(Purchase.objects.filter(lvlup_id='abc', status=0), 'purchase_lvlup_status_idx')
+        self.assertUsesIndex(Purchase.objects.filter(product_id=1, status=1).order_by('-date'),
+                             'purchase_product_status_idx')
+        self.assertUsesIndex(Voucher.objects.filter(code='abc', server_id=1, status=0), 'code=? AND server_id=?')
+        self.assertUsesIndex(PaymentOperator.objects.filter(server_id=1, operator_type='lvlup_sms'),
+                             'operator_type=?')
+        self.assertUsesIndex(Server.objects.filter(domain='sklep.example.com'), 'domain=?')
+        self.assertUsesIndex(DeliveryJob.objects.filter(status=0, next_attempt__lte=timezone.now()),
+                             'deliveryjob_status_next_idx')
+
+
+class PurchaseContextTestCase(TestCase):
+    def setUp(self):
+        self.server = Server.objects.create(server_name='Test', server_ip='127.0.0.1', rcon_password='x',
+                                            rcon_port=25575, owner_id=1)
+        self.product = Product.objects.create(product_name='VIP', product_description='VIP', server=self.server,
+                                              product_commands='give {PLAYER} diamond', lvlup_sms_number=7055)
+        PaymentOperator.objects.create(server=self.server, operator_type='lvlup_sms', operator_name='lvlup',
+                                       client_id=123)
+        PaymentOperator.objects.create(server=self.server, operator_type='lvlup_other', operator_name='lvlup',
+                                       api_key='key')
+
+    def test_product_context(self):
+        with self.assertNumQueries(1):
+            context = load_product_context(self.product.id, 'lvlup_sms', lvlup_sms_number=7055)
+        self.assertEqual((context.product_id, context.server_id, context.client_id, context.product_commands),
+                         (self.product.id, self.server.id, 123, 'give {PLAYER} diamond'))
+        self.assertTrue(context.server_status)
+        self.assertIsNone(load_product_context(self.product.id, 'lvlup_sms', lvlup_sms_number=7155))
+        self.assertIsNone(load_product_context(self.product.id, 'microsms_sms'))
+
+    def test_purchase_context(self):
+        purchase = Purchase.objects.create(product=self.product, buyer='Steve', lvlup_id='abc', status=0,
+                                           operator='lvlup_other', price=Decimal('0'))
+        with self.assertNumQueries(1):
+            context = load_purchase_context('abc', 'lvlup_other')
+        self.assertEqual((context.purchase_id, context.buyer, context.api_key), (purchase.id, 'Steve', 'key'))
+        Purchase.objects.filter(id=purchase.id).update(status=2)
+        self.assertIsNone(load_purchase_context('abc', 'lvlup_other'))
+
+
+class VoucherRedemptionTestCase(TestCase):
+    def setUp(self):
+        self.rcon = FakeRconServer()
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=self.rcon.start(), owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        product = Product.objects.create(product_name='vip', product_description='opis', server=self.server,
+                                         product_commands='say {PLAYER}')
+        self.voucher = Voucher.objects.create(product=product, server=self.server, code='KOD', player='', status=0)
+
+    def tearDown(self):
+        self.rcon.stop()
+
+    def redeem(self, player):
+        request = RequestFactory().post('/use_voucher/', {'player_nick': player, 'voucher_code': 'KOD',
+                                                          'server_id': str(self.server.id)})
+        return use_voucher(request).status_code
+
+    def test_voucher_is_claimed_once(self):
+        self.assertEqual(self.redeem('Steve'), 200)
+        self.assertEqual(self.redeem('Alex'), 401)
+        self.voucher.refresh_from_db()
+        self.assertEqual((self.voucher.status, self.voucher.player), (2, 'Steve'))
+
+        process_delivery_jobs()
+        self.voucher.refresh_from_db()
+        self.assertEqual(self.voucher.status, 1)
+
+    @override_settings(DELIVERY_MAX_ATTEMPTS=1)
+    def test_failed_delivery_releases_claim(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        Server.objects.filter(id=self.server.id).update(rcon_port=closed.getsockname()[1])
+        closed.close()
+        self.assertEqual(self.redeem('Steve'), 200)
+        process_delivery_jobs()
+        self.voucher.refresh_from_db()
+        self.assertEqual((self.voucher.status, self.voucher.player), (0, ''))
+
+
+class VoucherBatchTestCase(TestCase):
+    def setUp(self):
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=25575, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        self.product = Product.objects.create(product_name='vip', product_description='opis', server=self.server,
+                                              product_commands='say {PLAYER}')
+
+    def test_codes_are_unique_despite_collisions(self):
+        # Przy dwóch znakach jest tylko 1296 kodów, więc kolizje na pewno się zdarzą
+        first = generate_voucher_batch(self.server.id, self.product.id, 200, length=2, chunk_size=50)
+        second = generate_voucher_batch(self.server.id, self.product.id, 200, length=2, chunk_size=50)
+        self.assertEqual(Voucher.objects.filter(batch=first).count(), 200)
+        self.assertEqual(Voucher.objects.filter(batch=second).count(), 200)
+        self.assertEqual(Voucher.objects.values('code').distinct().count(), 400)
+
+    def export(self, batch, export_format):
+        request = RequestFactory().get('/', {'format': export_format})
+        request.session = {'username': 'test', 'user_id': '1'}
+        response = export_vouchers(request, server_id=self.server.id, batch_id=batch.id)
+        return b''.join(response.streaming_content).decode('utf8')
+
+    def test_export(self):
+        batch = generate_voucher_batch(self.server.id, self.product.id, 1000)
+        codes = set(Voucher.objects.filter(batch=batch).values_list('code', flat=True))
+
+        lines = self.export(batch, 'csv').splitlines()
+        self.assertEqual(lines[0], 'code,product,status,player')
+        self.assertEqual({line.split(',')[0] for line in lines[1:]}, codes)
+
+        rows = [json.loads(line) for line in self.export(batch, 'ndjson').splitlines()]
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(rows[0]['product'], 'vip')
+
+
+class DuplicateVoucherCodeTestCase(SimpleTestCase):
+    def test_unused_voucher_keeps_code(self):
+        code_owner = importlib.import_module('shop.migrations.0013_voucher_server').code_owner
+        used, unused, newer = (SimpleNamespace(id=1, status=1), SimpleNamespace(id=2, status=0),
+                               SimpleNamespace(id=3, status=0))
+        self.assertIs(code_owner([used, unused, newer]), unused)
+        self.assertIs(code_owner([used, SimpleNamespace(id=2, status=2)]), used)
+
+
+class PurchaseExportTestCase(TestCase):
+    def setUp(self):
+        self.server = Server.objects.create(server_name='test', server_ip='127.0.0.1', rcon_password='secret',
+                                            rcon_port=25575, owner_id=1, server_version='1.16.5',
+                                            server_players='0/100')
+        self.vip = Product.objects.create(product_name='=vip', product_description='opis', server=self.server,
+                                          product_commands='say {PLAYER}', lvlup_sms_number=72068)
+        self.svip = Product.objects.create(product_name='svip', product_description='opis', server=self.server,
+                                           product_commands='say {PLAYER}', lvlup_other_price='15')
+        now = timezone.now()
+        for days, product, lvlup_id, operator, price in [(10, self.vip, 'lvlup_sms', 'lvlup_sms', '2.46'),
+                                                         (3, self.vip, 'lvlup_sms', 'lvlup_sms', '2.46'),
+                                                         (2, self.svip, 'abc123', 'lvlup_other', '15.00'),
+                                                         (0, self.vip, 'lvlup_sms', 'lvlup_sms', '2.46')]:
+            Purchase.objects.create(product=product, buyer='Steve', lvlup_id=lvlup_id, status=1,
+                                    operator=operator, price=Decimal(price), date=now - timedelta(days=days))
+
+    def export(self, **params):
+        request = RequestFactory().get('/', params)
+        request.session = {'username': 'test', 'user_id': '1'}
+        response = export_purchases(request, server_id=self.server.id)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf8')
+
+    def test_csv_with_date_range(self):
+        # Eksport pokazuje zapłaconą kwotę, a nie aktualną cenę produktu
+        Product.objects.filter(id=self.svip.id).update(lvlup_other_price='20')
+        today = timezone.localdate()
+        lines = self.export(**{'format': 'csv', 'from': (today - timedelta(days=3)).isoformat(),
+                               'to': (today - timedelta(days=1)).isoformat()}).splitlines()
+        self.assertEqual(lines[0], 'id,date,product_id,product,buyer,status,operator,price')
+        self.assertEqual([line.split(',')[3:] for line in lines[1:]],
+                         [["'=vip", 'Steve', '1', 'lvlup_sms', '2.46'], ['svip', 'Steve', '1', 'lvlup_other', '15.00']])
+
+    def test_ndjson_with_product_filter(self):
+        rows = [json.loads(line) for line in self.export(format='ndjson', product_id=self.vip.id).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['product'], '=vip')
+        self.assertLess(rows[0]['date'], rows[-1]['date'])
+
+    def test_invalid_dates(self):
+        for params in [{'from': '2024/01/01'}, {'to': '2024-02-30'}, {'from': '2024-02-01', 'to': '2024-01-01'}]:
+            request = RequestFactory().get('/', params)
+            request.session = {'username': 'test', 'user_id': '1'}
+            self.assertEqual(export_purchases(request, server_id=self.server.id).status_code, 400)
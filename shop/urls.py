@@ -8,14 +8,21 @@ urlpatterns = [
     path('logout/', views.logout, name='logout'),
     path('add_server/', views.add_server, name='add_server'),
     path('panel/<int:server_id>/', views.panel, name='panel'),
+    path('panel/<int:server_id>/purchases/', views.purchase_history, name='purchase_history'),
+    path('panel/<int:server_id>/purchases/export/', views.export_purchases, name='export_purchases'),
+    path('panel/<int:server_id>/stats/', views.sales_statistics, name='sales_statistics'),
     path('add_product/', views.add_product, name='add_product'),
     path('add_operator/<operator_type>', views.add_operator, name='add_operator'),
     path('save_settings2/', views.save_settings2, name='save_settings2'),
     path('remove_product/', views.remove_product, name='remove_product'),
     path('generate_voucher/', views.generate_voucher, name='generate_voucher'),
+    path('generate_vouchers/', views.generate_vouchers, name='generate_vouchers'),
+    path('panel/<int:server_id>/vouchers/<int:batch_id>/', views.export_vouchers, name='export_vouchers'),
     path('customize_website/', views.customize_website, name='customize_website'),
     path('remove_payment_operator/', views.remove_payment_operator, name='remove_payment_operator'),
     path('shop/<int:server_id>/', views.shop, name='shop'),
+    path('image/avatar/<str:player>/<int:size>/', views.avatar, name='avatar'),
+    path('image/product/<int:product_id>/', views.product_image, name='product_image'),
     path('use_voucher/', views.use_voucher, name='use_voucher'),
     path('success/', views.success_page, name='success_page'),
     path('faq/', views.faq, name='faq'),
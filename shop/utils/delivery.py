@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from shop.models import DeliveryJob, Purchase, Voucher
+from shop.utils.functions import send_commands
+from shop.utils.notifications import enqueue_notification
+from shop.utils.page_cache import touch_server
+from shop.utils.rcon import RconBatchError
+from shop.utils.stats import record_sale
+
+
+# Musi być wywołane w tej samej transakcji, w której zapisywany jest zakup lub voucher
+def enqueue_delivery(server_id, commands, buyer, purchase_id=None, voucher_id=None):
+    return DeliveryJob.objects.create(
+        server_id=server_id,
+        purchase_id=purchase_id,
+        voucher_id=voucher_id,
+        buyer=buyer,
+        commands=commands
+    )
+
+
+def retry_delay(attempts):
+    delay = settings.DELIVERY_RETRY_BASE * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.DELIVERY_RETRY_MAX))
+
+
+# Zadanie przejmuje ten worker, któremu uda się zmienić jego status, więc kilka workerów może działać naraz
+def claim_delivery_jobs(limit):
+    now = timezone.now()
+    due = DeliveryJob.objects.filter(
+        Q(status=0, next_attempt__lte=now) | Q(status=3, locked_until__lte=now)
+    ).order_by('next_attempt').values_list('id', 'status')[:limit]
+
+    claimed = []
+    for job_id, status in due:
+        updated = DeliveryJob.objects.filter(id=job_id, status=status).update(
+            status=3,
+            locked_until=now + timedelta(seconds=settings.DELIVERY_LOCK_TIMEOUT)
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+# Zwraca None po dostarczeniu komend, w przeciwnym razie błąd, przez który się nie udało
+def deliver(job):
+    commands = job.commands.split(';')
+    try:
+        results = send_commands(job.server_id, job.server.server_ip, job.server.rcon_password, commands, job.buyer,
+                                job.server.rcon_port)
+    except RconBatchError as e:
+        # Komendy potwierdzone przez serwer nie są wysyłane ponownie przy kolejnej próbie
+        remaining = [result.command for result in e.results if not result.delivered]
+        if remaining:
+            delivery_failed(job, e, remaining)
+            return e
+        # Połączenie zerwało się dopiero po potwierdzeniu wszystkich komend
+        results = e.results
+    except Exception as e:
+        delivery_failed(job, e)
+        return e
+
+    unknown = [result.command for result in results if not result.success]
+    last_error = ("Nieznane komendy: " + "; ".join(unknown))[:200] if unknown else ""
+    with transaction.atomic():
+        DeliveryJob.objects.filter(id=job.id).update(status=1, attempts=job.attempts + 1, locked_until=None,
+                                                     last_error=last_error)
+        # Do statystyk trafia tylko pierwsze dostarczenie zakupu
+        if job.purchase_id and Purchase.objects.filter(id=job.purchase_id).exclude(status=1).update(status=1):
+            record_sale(job.purchase)
+            touch_server(job.server_id)
+            if job.server.discord_webhook:
+                enqueue_notification(job.server_id, job.buyer, job.purchase.product.product_name)
+        if job.voucher_id:
+            Voucher.objects.filter(id=job.voucher_id, status=2).update(status=1)
+    return None
+
+
+def delivery_failed(job, error, remaining=None):
+    attempts = job.attempts + 1
+    last_error = str(error)[:200]
+    commands = ";".join(remaining) if remaining is not None else job.commands
+
+    if attempts < settings.DELIVERY_MAX_ATTEMPTS:
+        DeliveryJob.objects.filter(id=job.id).update(status=0, attempts=attempts, locked_until=None,
+                                                     next_attempt=timezone.now() + retry_delay(attempts),
+                                                     last_error=last_error, commands=commands)
+        return
+
+    with transaction.atomic():
+        DeliveryJob.objects.filter(id=job.id).update(status=2, attempts=attempts, locked_until=None,
+                                                     last_error=last_error)
+        if job.purchase_id:
+            Purchase.objects.filter(id=job.purchase_id).update(status=3)
+        # Voucher, którego nie udało się zrealizować, wraca do puli
+        if job.voucher_id:
+            Voucher.objects.filter(id=job.voucher_id, status=2).update(status=0, player="")
+
+
+"""
+Zadania są obsługiwane po kolei dla każdego serwera. Gdy dostarczenie się nie uda (serwer wyłączony,
+złe hasło rcon, zerwane połączenie), pozostałe zadania tego serwera dostają ten sam błąd bez kolejnej
+próby połączenia. Inaczej każde z nich czekałoby osobno RCON_TIMEOUT, wstrzymując dostarczanie
+na inne serwery, a cała paczka mogłaby trwać dłużej niż DELIVERY_LOCK_TIMEOUT.
+"""
+
+
+def process_delivery_jobs(limit=50):
+    job_ids = claim_delivery_jobs(limit)
+    jobs = DeliveryJob.objects.filter(id__in=job_ids).select_related('server', 'purchase__product').order_by('id')
+    by_server = OrderedDict()
+    for job in jobs:
+        by_server.setdefault(job.server_id, []).append(job)
+
+    delivered = 0
+    for server_jobs in by_server.values():
+        for i, job in enumerate(server_jobs):
+            error = deliver(job)
+            if error is None:
+                delivered += 1
+                continue
+            for skipped in server_jobs[i + 1:]:
+                delivery_failed(skipped, error)
+            break
+    return len(job_ids), delivered
+
+
+def process_delivery_queue(limit=50):
+    while True:
+        claimed, delivered = process_delivery_jobs(limit)
+        if claimed < limit:
+            return
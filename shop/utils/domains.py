@@ -0,0 +1,66 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from shop.models import Server
+
+"""
+Mapa własnych domen sklepów (domena -> id serwera) trzymana w pamięci procesu.
+
+Po zmianie domeny customize_website zapisuje w cache nowy znacznik wersji, a procesy porównują go
+ze swoim najwyżej co DOMAIN_ROUTES_CHECK_INTERVAL sekund. Przy domyślnym LocMemCache znacznik widzi
+tylko proces, który zmienił domenę, dlatego mapa i tak jest wczytywana od nowa co DOMAIN_ROUTES_MAX_AGE sekund.
+"""
+
+VERSION_KEY = 'domain_routes_version'
+
+
+class DomainRoutes(object):
+    def __init__(self, max_age, check_interval):
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.routes = None
+        self.version = None
+        self.loaded_at = 0
+        self.checked_at = 0
+
+    def _load(self):
+        version = cache.get(VERSION_KEY)
+        routes = {}
+        for domain, server_id in Server.objects.exclude(domain__isnull=True).values_list('domain', 'id'):
+            domain = domain.strip().lower()
+            if domain:
+                routes[domain] = server_id
+        self.routes = routes
+        self.version = version
+        self.loaded_at = self.checked_at = time.monotonic()
+
+    def _is_stale(self):
+        now = time.monotonic()
+        if self.routes is None or now - self.loaded_at > self.max_age:
+            return True
+        if now - self.checked_at > self.check_interval:
+            self.checked_at = now
+            return cache.get(VERSION_KEY) != self.version
+        return False
+
+    def resolve(self, domain):
+        with self.lock:
+            if self._is_stale():
+                self._load()
+            return self.routes.get(domain.strip().lower())
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        with self.lock:
+            self.routes = None
+
+
+domain_routes = DomainRoutes(
+    max_age=settings.DOMAIN_ROUTES_MAX_AGE,
+    check_interval=settings.DOMAIN_ROUTES_CHECK_INTERVAL
+)
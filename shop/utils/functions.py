@@ -1,15 +1,16 @@
 import threading
-import requests
 import random
 import string
-import time
 import re
 
-from shop.models import Server
+from shop.models import Server, ServerAdmin
+from django.conf import settings
 from django.http import JsonResponse
 from django.contrib import messages
 from django.shortcuts import redirect
-from mcrcon import MCRcon
+from sanitizer.templatetags.sanitizer import strip_filter
+from shop.utils.rcon import RconClient, AsyncRconClient
+from shop.utils.rcon_pool import rcon_pool
 
 
 # Sprawdza, czy użytkownik jest zalogowany i posiada dostęp do zarządzania serwerem
@@ -28,15 +29,13 @@ def login_required(function):
             except KeyError as e:
                 server_id = request.POST.get('server_id')
 
-            user_id = request.session['user_id']
-            owner_id = Server.objects.filter(id=server_id).values('owner_id')
+            has_access = Server.user_has_access(server_id, request.session['user_id'])
 
-            if not owner_id:
+            if has_access is None:
                 messages.add_message(request, messages.ERROR, 'Taki serwer nie istnieje.')
                 return redirect('/')
 
-            admins = Server.get_admins(server_id)
-            if int(user_id) == owner_id[0]['owner_id'] or user_id in admins:
+            if has_access:
                 return function(request, *args, **kw)
 
             if request.method == 'GET':
@@ -47,44 +46,70 @@ def login_required(function):
     return wrapper
 
 
-def send_webhook_discord(webhook_url, buyer, product_name):
-    json_payload = {
-        "embeds": [
-            {
-                "title": "Zakup produktu",
-                "image": {
-                    "url": f"https://minotar.net/avatar/{buyer}/50"
-                },
-                "color": 3066993,
-                "description": f"Gracz **{buyer}** zakupił **{product_name}**. Dziękujemy! :heart:"
-            }],
-    }
-
-    r = requests.post(webhook_url, json=json_payload)
-
-
-def send_commands(server_ip, rcon_password, commands, buyer, rcon_port):
-    server_ip = str(server_ip).split(':')[0]
-    mcr = MCRcon(server_ip, rcon_password, int(rcon_port))
-    mcr.connect()
-    for command in commands:
-        mcr.command(command.replace("{PLAYER}", buyer))
-    mcr.disconnect()
+# Zwraca listę RconResult, po jednym dla każdej komendy
+def send_commands(server_id, server_ip, rcon_password, commands, buyer, rcon_port):
+    commands = [command.replace("{PLAYER}", buyer) for command in commands]
+    return rcon_pool.send_commands(server_id, server_ip, rcon_password, rcon_port, commands)
 
 
 def check_rcon_connection(server_ip, rcon_password, rcon_port):
     try:
         new_server_ip = str(server_ip).split(':')[0]
         print(new_server_ip)
-        mcr = MCRcon(new_server_ip, rcon_password, int(rcon_port))
-        mcr.connect()
-        mcr.disconnect()
+        with RconClient(new_server_ip, rcon_port, rcon_password, settings.RCON_TIMEOUT):
+            pass
         return True
     except Exception as e:
         print(e)
         return False
 
 
+async def send_commands_async(server_ip, rcon_password, commands, buyer, rcon_port):
+    server_ip = str(server_ip).split(':')[0]
+    commands = [command.replace("{PLAYER}", buyer) for command in commands]
+    async with AsyncRconClient(server_ip, rcon_port, rcon_password, settings.RCON_TIMEOUT) as rcon:
+        return await rcon.command_batch(commands)
+
+
+async def check_rcon_connection_async(server_ip, rcon_password, rcon_port):
+    try:
+        server_ip = str(server_ip).split(':')[0]
+        async with AsyncRconClient(server_ip, rcon_port, rcon_password, settings.RCON_TIMEOUT):
+            pass
+        return True
+    except Exception:
+        return False
+
+
+# Opis produktu po usunięciu niedozwolonych tagów (SANITIZER_ALLOWED_*), liczony raz przy zapisie produktu
+def sanitize_description(description):
+    return strip_filter(description or '')
+
+
+# Zwraca poprawne id użytkowników Discorda (same cyfry, mieszczące się w ServerAdmin.user_id) i odrzucone wpisy
+def parse_admins(admins):
+    max_length = ServerAdmin._meta.get_field('user_id').max_length
+    user_ids, rejected = set(), []
+    for user_id in (admins or '').split(','):
+        user_id = user_id.strip()
+        if not user_id:
+            continue
+        if user_id.isdigit() and user_id.isascii() and len(user_id) <= max_length:
+            user_ids.add(user_id)
+        else:
+            rejected.append(user_id)
+    return user_ids, rejected
+
+
+# Zapisuje listę administratorów z pola Server.admins w tabeli ServerAdmin, odrzucone wpisy są pomijane
+def set_server_admins(server_id, admins):
+    user_ids, _ = parse_admins(admins)
+    ServerAdmin.objects.filter(server_id=server_id).exclude(user_id__in=user_ids).delete()
+    existing = set(ServerAdmin.objects.filter(server_id=server_id).values_list('user_id', flat=True))
+    ServerAdmin.objects.bulk_create([ServerAdmin(server_id=server_id, user_id=user_id)
+                                     for user_id in user_ids - existing])
+
+
 def generate_random_chars(length):
     return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
 
@@ -95,35 +120,3 @@ def validate_player_nick(player_nick):
     if not pattern.match(player_nick):
         return False
     return True
-
-
-def check_rcon():
-    while True:
-        servers = Server.objects.all()
-        count_servers = len(servers)
-        x = 60 * 60 * 3 / count_servers
-        for server in Server.objects.all():
-            rcon_status = check_rcon_connection(server.server_ip, server.rcon_password, server.rcon_port)
-            if not rcon_status:
-                Server.objects.filter(id=server.id).update(rcon_status=False)
-            else:
-                Server.objects.filter(id=server.id).update(rcon_status=True)
-            time.sleep(x)
-
-
-def actualize_servers_data():
-    while True:
-        servers = Server.objects.all()
-        count_servers = len(servers)
-        x = 6 * 60 / count_servers - 0.2
-        for server in Server.objects.all():
-            get_server_data = requests.get('https://api.mcsrvstat.us/2/' + server.server_ip).json()
-            status = get_server_data["online"]
-            if status:
-                version = get_server_data["version"]
-                players = str(get_server_data["players"]["online"]) + '/' + str(get_server_data["players"]["max"])
-                Server.objects.filter(id=server.id).update(server_status=status, server_version=version,
-                                                           server_players=players)
-            else:
-                Server.objects.filter(id=server.id).update(server_status=status)
-            time.sleep(x)
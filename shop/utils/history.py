@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from shop.models import Purchase
+
+"""
+Historia zakupów serwera dzielona na strony kursorem (date, id) zamiast OFFSET.
+Kolejna strona zaczyna się zaraz za ostatnim zakupem poprzedniej, więc baza nie musi
+przechodzić przez wszystkie wcześniejsze wiersze, a nowe zakupy nie przesuwają stron.
+"""
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(purchase):
+    value = f'{purchase.date.isoformat()}|{purchase.id}'
+    return base64.urlsafe_b64encode(value.encode('utf8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        date, _, purchase_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf8').partition('|')
+        date = parse_datetime(date)
+        purchase_id = int(purchase_id)
+    except (ValueError, UnicodeError):
+        raise InvalidCursor('Niepoprawny kursor.')
+    if date is None:
+        raise InvalidCursor('Niepoprawny kursor.')
+    return date, purchase_id
+
+
+def purchase_to_dict(purchase):
+    return {
+        'id': purchase.id,
+        'product': purchase.product.product_name,
+        'product_id': purchase.product_id,
+        'buyer': purchase.buyer,
+        'status': purchase.status,
+        'date': timezone.localtime(purchase.date).strftime('%d.%m.%Y %H:%M')
+    }
+
+
+# Zwraca (zakupy, kursor następnej strony albo None)
+def purchase_history_page(server_id, cursor=None, limit=None, status=None, product_id=None, buyer=None):
+    limit = min(max(limit or settings.PURCHASE_HISTORY_PAGE_SIZE, 1), settings.PURCHASE_HISTORY_MAX_PAGE_SIZE)
+    purchases = Purchase.objects.filter(product__server_id=server_id).select_related('product')
+    if status is not None:
+        purchases = purchases.filter(status=status)
+    if product_id is not None:
+        purchases = purchases.filter(product_id=product_id)
+    if buyer:
+        purchases = purchases.filter(buyer__iexact=buyer)
+    if cursor:
+        date, purchase_id = decode_cursor(cursor)
+        purchases = purchases.filter(Q(date__lt=date) | Q(date=date, id__lt=purchase_id))
+
+    page = list(purchases.order_by('-date', '-id')[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+PURCHASE_EXPORT_HEADER = ['id', 'date', 'product_id', 'product', 'buyer', 'status', 'operator', 'price']
+
+
+# Wiersze do eksportu (shop/utils/export.py) od najstarszego zakupu, daty start i end włącznie w strefie czasowej sklepu
+def purchase_export_rows(server_id, start=None, end=None, product_id=None, status=None):
+    purchases = Purchase.objects.filter(product__server_id=server_id)
+    if start:
+        purchases = purchases.filter(date__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        purchases = purchases.filter(date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    if product_id is not None:
+        purchases = purchases.filter(product_id=product_id)
+    if status is not None:
+        purchases = purchases.filter(status=status)
+
+    rows = purchases.order_by('date', 'id').values_list(
+        'id', 'date', 'product_id', 'product__product_name', 'buyer', 'status', 'operator', 'price'
+    ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+    for purchase_id, date, product_id, product_name, buyer, status, operator, price in rows:
+        yield (purchase_id, timezone.localtime(date).isoformat(), product_id, product_name, buyer, status, operator,
+               f'{price:.2f}')
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+"""
+Wspólny klient HTTP dla zewnętrznych usług (lvlup, microsms, reCAPTCHA, Discord, obrazki).
+Każda integracja z HTTP_INTEGRATIONS ma własną sesję requests, więc połączenia keep-alive
+są trzymane w pulach per host i nie trzeba za każdym razem od nowa robić handshake TLS.
+
+Błędy połączenia są ponawiane dla każdej metody (zapytanie nie dotarło do serwera),
+odpowiedzi 5xx tylko dla metod idempotentnych. Błędy odczytu nie są ponawiane,
+bo np. kod SMS mógł już zostać wykorzystany.
+"""
+
+
+class HttpMetrics(object):
+    buckets = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def record(self, name, seconds, error):
+        with self.lock:
+            entry = self.data.get(name)
+            if entry is None:
+                entry = self.data[name] = {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                                           'buckets': [0] * (len(self.buckets) + 1)}
+            entry['count'] += 1
+            entry['errors'] += int(error)
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            for i, bucket in enumerate(self.buckets):
+                if seconds <= bucket:
+                    entry['buckets'][i] += 1
+                    break
+            else:
+                entry['buckets'][-1] += 1
+
+    # Czasy odpowiedzi zebrane w tym procesie, kubełki histogramu odpowiadają HttpMetrics.buckets (ostatni to reszta)
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: dict(entry, buckets=list(entry['buckets']), average=entry['total'] / entry['count'])
+                for name, entry in self.data.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.data = {}
+
+
+class HttpClient(object):
+    def __init__(self, name, timeout, retries=0, status_retries=0, backoff=0.3, pool_connections=10,
+                 pool_size=10, adapter_class=HTTPAdapter):
+        self.name = name
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Ciasteczka z odpowiedzi dla jednego użytkownika nie mogą trafić do zapytań innego
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        retry = Retry(total=retries + status_retries, connect=retries, read=False, status=status_retries,
+                      status_forcelist=(500, 502, 503, 504), backoff_factor=backoff, raise_on_status=False)
+        adapter = adapter_class(pool_connections=pool_connections, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.monotonic()
+        error = True
+        try:
+            response = self.session.request(method, url, **kwargs)
+            error = response.status_code >= 500
+            return response
+        finally:
+            elapsed = time.monotonic() - started
+            metrics.record(self.name, elapsed, error)
+            if elapsed > settings.HTTP_SLOW_REQUEST:
+                logger.warning('Wolne zapytanie %s %s (%s): %.2f s', method, url.split('?')[0], self.name, elapsed)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def http_client(name):
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            config = settings.HTTP_INTEGRATIONS.get(name) or settings.HTTP_INTEGRATIONS['default']
+            client = _clients[name] = HttpClient(name, **config)
+        return client
+
+
+metrics = HttpMetrics()
@@ -0,0 +1,231 @@
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import requests
+from urllib.parse import urlsplit
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from django.conf import settings
+
+from shop.utils.http import HttpClient
+
+"""
+Pośrednik dla obrazków z zewnętrznych serwisów (główki graczy z minotar.net, zdjęcia produktów).
+Obrazek jest pobierany raz, zmniejszany, kompresowany od nowa i zapisywany na dysku w IMAGE_CACHE_DIR.
+Gdy katalog przekroczy IMAGE_CACHE_MAX_SIZE bajtów, usuwane są pliki najdawniej używane
+(czas modyfikacji pliku jest odświeżany przy każdym odczycie).
+"""
+
+
+class ImageError(Exception):
+    pass
+
+
+class ImageCache(object):
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.size = None  # Przybliżony rozmiar katalogu, liczony od nowa przy każdym sprzątaniu
+
+    def path(self, key):
+        name = hashlib.sha256(key.encode('utf8')).hexdigest()
+        return os.path.join(self.directory, name[:2], name)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Zapis do pliku tymczasowego i podmiana, żeby inny proces nie odczytał połowy obrazka
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self.lock:
+            if self.size is None:
+                self.size = self._scan_size()
+            else:
+                self.size += len(data)
+            if self.size > self.max_size:
+                self.evict()
+
+    def _files(self):
+        files = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan_size(self):
+        return sum(size for mtime, size, path in self._files())
+
+    # Usuwa najdawniej używane pliki, aż katalog zajmie najwyżej 90% limitu
+    def evict(self):
+        files = sorted(self._files())
+        size = sum(size for mtime, size, path in files)
+        target = self.max_size * 0.9
+        for mtime, file_size, path in files:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                pass
+        self.size = size
+
+
+def check_url(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ImageError('Niepoprawny adres obrazka.')
+
+
+# Zdjęcia produktów podają właściciele serwerów, więc pośrednik nie pobiera niczego z adresów w sieci lokalnej
+def resolve_public_address(host, port):
+    try:
+        addresses = [address[4][0] for address in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)]
+    except (OSError, UnicodeError):
+        raise ImageError('Nie można znaleźć serwera obrazka.')
+    if not settings.IMAGE_PROXY_ALLOW_PRIVATE:
+        for address in addresses:
+            if not ipaddress.ip_address(address.split('%')[0]).is_global:
+                raise ImageError('Niepoprawny adres obrazka.')
+    return addresses[0]
+
+
+"""
+Adres serwera obrazka jest sprawdzany dopiero przy otwieraniu połączenia, a połączenie idzie na ten sam,
+sprawdzony adres. Gdyby requests rozwiązywał nazwę drugi raz, serwer DNS mógłby za drugim razem
+odpowiedzieć adresem z sieci lokalnej (DNS rebinding). Nagłówek Host, SNI i certyfikat dotyczą nadal nazwy z adresu.
+"""
+
+
+class PublicAddressMixin(object):
+    def _new_conn(self):
+        self._dns_host = resolve_public_address(self._dns_host, self.port)
+        return super()._new_conn()
+
+
+class PublicHTTPConnection(PublicAddressMixin, HTTPConnection):
+    pass
+
+
+class PublicHTTPSConnection(PublicAddressMixin, HTTPSConnection):
+    pass
+
+
+class PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PublicHTTPConnection
+
+
+class PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = PublicHTTPSConnection
+
+
+class PublicAddressAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': PublicHTTPConnectionPool,
+                                                   'https': PublicHTTPSConnectionPool}
+
+
+def fetch_image(url):
+    check_url(url)
+    try:
+        response = images_client.get(url, stream=True, allow_redirects=False,
+                                     headers={'User-Agent': 'IVshop image proxy'})
+        with response:
+            if response.status_code != 200:
+                raise ImageError(f'Serwer obrazka odpowiedział {response.status_code}.')
+            data = b''
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > settings.IMAGE_PROXY_MAX_BYTES:
+                    raise ImageError('Obrazek jest za duży.')
+            return data
+    except requests.RequestException as e:
+        raise ImageError(str(e))
+
+
+# Zwraca (dane, content type). Obrazki z przezroczystością zostają w PNG, pozostałe są zapisywane jako JPEG.
+def make_thumbnail(data, max_width, max_height):
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > settings.IMAGE_PROXY_MAX_PIXELS:
+            raise ImageError('Obrazek ma za dużą rozdzielczość.')
+        image.thumbnail((max_width, max_height), Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(str(e))
+
+    out = io.BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P') or 'transparency' in image.info:
+        image.convert('RGBA').save(out, 'PNG', optimize=True)
+        return out.getvalue(), 'image/png'
+    image.convert('RGB').save(out, 'JPEG', quality=settings.IMAGE_PROXY_JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue(), 'image/jpeg'
+
+
+def content_type(data):
+    return 'image/png' if data.startswith(b'\x89PNG') else 'image/jpeg'
+
+
+# Z refresh_interval obrazek jest pobierany od nowa co tyle sekund (np. gdy gracz zmieni skina)
+def get_thumbnail(url, max_width, max_height, refresh_interval=None):
+    key = f'{url}|{max_width}x{max_height}'
+    if refresh_interval:
+        key += f'|{int(time.time() // refresh_interval)}'
+    data = image_cache.get(key)
+    if data is not None:
+        return data, content_type(data)
+
+    data, mime_type = make_thumbnail(fetch_image(url), max_width, max_height)
+    image_cache.set(key, data)
+    return data, mime_type
+
+
+def avatar_url(player, size):
+    return settings.AVATAR_URL.format(player=player, size=size)
+
+
+images_client = HttpClient('images', adapter_class=PublicAddressAdapter, **settings.HTTP_INTEGRATIONS['images'])
+images_client.session.trust_env = False  # Przez serwer proxy z HTTP_PROXY sprawdzanie adresu nie miałoby sensu
+
+image_cache = ImageCache(
+    directory=settings.IMAGE_CACHE_DIR,
+    max_size=settings.IMAGE_CACHE_MAX_SIZE
+)
@@ -0,0 +1,155 @@
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from shop.models import DiscordNotification
+from shop.utils.http import http_client
+
+"""
+Powiadomienia o zakupach na webhook Discorda wysyła run_worker, a nie widok czy kolejka komend.
+Zakupy z jednego serwera czekają DISCORD_NOTIFY_WINDOW sekund od pierwszego z nich i są wysyłane
+razem, najwyżej MAX_EMBEDS w jednej wiadomości. Limity Discorda są zapamiętywane z nagłówków
+X-RateLimit-* (osobno dla każdego kubełka) i Retry-After po odpowiedzi 429.
+"""
+
+MAX_EMBEDS = 10  # Limit Discorda dla jednej wiadomości
+
+
+def enqueue_notification(server_id, buyer, product_name):
+    return DiscordNotification.objects.create(server_id=server_id, buyer=buyer, product_name=product_name)
+
+
+def purchase_embed(buyer, product_name):
+    return {
+        "title": "Zakup produktu",
+        "image": {
+            "url": f"{settings.SITE_URL}/image/avatar/{buyer}/50/"
+        },
+        "color": 3066993,
+        "description": f"Gracz **{buyer}** zakupił **{product_name}**. Dziękujemy! :heart:"
+    }
+
+
+def retry_delay(attempts):
+    delay = settings.DISCORD_NOTIFY_RETRY_BASE * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.DISCORD_NOTIFY_RETRY_MAX))
+
+
+def parse_seconds(value):
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimits(object):
+    def __init__(self):
+        self.routes = {}  # Adres webhooka -> kubełek z nagłówka X-RateLimit-Bucket
+        self.blocked = {}  # Kubełek -> time.monotonic(), do kiedy nie wolno wysyłać
+        self.global_blocked = 0
+
+    def wait_time(self, url):
+        bucket = self.routes.get(url, url)
+        return max(self.blocked.get(bucket, 0), self.global_blocked) - time.monotonic()
+
+    # Zwraca liczbę sekund do odczekania po odpowiedzi 429, w pozostałych przypadkach None
+    def update(self, url, response):
+        now = time.monotonic()
+        bucket = response.headers.get('X-RateLimit-Bucket') or url
+        self.routes[url] = bucket
+        self.blocked = {key: until for key, until in self.blocked.items() if until > now}
+
+        if response.status_code == 429:
+            retry_after = parse_seconds(response.headers.get('Retry-After'))
+            if retry_after is None:
+                try:
+                    retry_after = parse_seconds(response.json().get('retry_after'))
+                except (ValueError, AttributeError):
+                    pass
+            retry_after = retry_after if retry_after is not None else 1
+            if response.headers.get('X-RateLimit-Global', '').lower() == 'true':
+                self.global_blocked = now + retry_after
+            else:
+                self.blocked[bucket] = now + retry_after
+            return retry_after
+
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            reset_after = parse_seconds(response.headers.get('X-RateLimit-Reset-After'))
+            self.blocked[bucket] = now + (reset_after if reset_after is not None else 1)
+        return None
+
+
+class DiscordNotifier(object):
+    def __init__(self, window=None):
+        self.window = settings.DISCORD_NOTIFY_WINDOW if window is None else window
+        self.rate_limits = RateLimits()
+
+    def run_once(self):
+        now = timezone.now()
+        pending = DiscordNotification.objects.filter(status=0, next_attempt__lte=now).select_related(
+            'server').order_by('id')[:settings.DISCORD_NOTIFY_BATCH]
+
+        groups = OrderedDict()
+        for notification in pending:
+            groups.setdefault(notification.server_id, []).append(notification)
+
+        sent = 0
+        for notifications in groups.values():
+            # Pojedyncze zakupy czekają chwilę na kolejne, pełna wiadomość idzie od razu
+            if len(notifications) < MAX_EMBEDS and notifications[0].date > now - timedelta(seconds=self.window):
+                continue
+            for i in range(0, len(notifications), MAX_EMBEDS):
+                if self.send(notifications[i:i + MAX_EMBEDS]):
+                    sent += 1
+        return sent
+
+    def send(self, notifications):
+        server = notifications[0].server
+        ids = [notification.id for notification in notifications]
+        queryset = DiscordNotification.objects.filter(id__in=ids)
+        if not server.discord_webhook:
+            queryset.update(status=2, last_error="Serwer nie ma ustawionego webhooka.")
+            return False
+
+        wait = self.rate_limits.wait_time(server.discord_webhook)
+        if wait > 0:
+            queryset.update(next_attempt=timezone.now() + timedelta(seconds=wait))
+            return False
+
+        embeds = [purchase_embed(notification.buyer, notification.product_name) for notification in notifications]
+        try:
+            response = http_client('discord_webhook').post(server.discord_webhook, json={"embeds": embeds})
+        except requests.RequestException as e:
+            self.failed(notifications, e)
+            return False
+
+        retry_after = self.rate_limits.update(server.discord_webhook, response)
+        if retry_after is not None:
+            # Odpowiedź 429 nie jest liczona jako nieudana próba
+            queryset.update(next_attempt=timezone.now() + timedelta(seconds=retry_after))
+            return False
+        if response.status_code >= 500:
+            self.failed(notifications, f"Discord odpowiedział {response.status_code}.")
+            return False
+        if response.status_code >= 400:
+            # Usunięty webhook albo niepoprawna wiadomość, ponawianie nic nie da
+            queryset.update(status=2, attempts=F('attempts') + 1,
+                            last_error=f"Discord odpowiedział {response.status_code}.")
+            return False
+
+        queryset.update(status=1, attempts=F('attempts') + 1, last_error="")
+        return True
+
+    def failed(self, notifications, error):
+        attempts = max(notification.attempts for notification in notifications) + 1
+        queryset = DiscordNotification.objects.filter(id__in=[notification.id for notification in notifications])
+        if attempts < settings.DISCORD_NOTIFY_MAX_ATTEMPTS:
+            queryset.update(attempts=attempts, next_attempt=timezone.now() + retry_delay(attempts),
+                            last_error=str(error)[:200])
+        else:
+            queryset.update(status=2, attempts=attempts, last_error=str(error)[:200])
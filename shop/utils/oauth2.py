@@ -1,5 +1,6 @@
-import requests
 from django.conf import settings
+
+from shop.utils.http import http_client
 from config import DISCORD_CLIENT_ID, DISCORD_CLIENT_SECRET, DISCORD_BOT_TOKEN, GUILD_ID
 
 
@@ -36,8 +37,8 @@ class Oauth(object):
             'Content-Type': 'application/x-www-form-urlencoded'
         }
 
-        access_token = requests.post(
-            url=Oauth.discord_token_url, data=payload, headers=headers)
+        access_token = http_client('discord_oauth').post(
+            Oauth.discord_token_url, data=payload, headers=headers)
         json = access_token.json()
         return json.get("access_token")
 
@@ -48,7 +49,7 @@ class Oauth(object):
         headers = {
             "Authorization": "Bearer {}".format(access_token)
         }
-        user_object = requests.get(url=url, headers=headers)
+        user_object = http_client('discord_oauth').get(url, headers=headers)
         user_json = user_object.json()
         return user_json
 
@@ -62,4 +63,4 @@ class Oauth(object):
         data = {
             "access_token": access_token
         }
-        requests.put(url=url, headers=headers, json=data).json()
+        http_client('discord_oauth').put(url, headers=headers, json=data).json()
@@ -0,0 +1,72 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from shop.models import Server
+
+"""
+Wyrenderowana strona sklepu jest trzymana w cache pod kluczem z numerem wersji serwera.
+Każda zmiana produktów, operatorów, linków, ustawień, statusu rcon albo nowy dostarczony zakup
+zwiększa Server.content_version, więc stare wpisy przestają być używane i same wygasają.
+Status, wersja i liczba graczy, odświeżane co chwilę, a widoczne tylko w liście serwerów w api,
+mają osobny znacznik Server.status_updated.
+Wersja jest w bazie, dlatego działa to tak samo z LocMemCache, jak i ze wspólnym cache.
+
+Z tej samej wersji powstają nagłówki ETag i Last-Modified, dzięki którym sklep i api
+odpowiadają 304 bez renderowania, jeśli klient ma aktualną kopię.
+"""
+
+
+def touch_server(server_id):
+    Server.objects.filter(id=server_id).update(content_version=F('content_version') + 1,
+                                               content_updated=timezone.now())
+
+
+def shop_page_key(server):
+    return f'shop_page:{server.id}:{server.content_version}'
+
+
+def get_shop_page(server):
+    return cache.get(shop_page_key(server))
+
+
+def set_shop_page(server, html):
+    cache.set(shop_page_key(server), html, settings.SHOP_PAGE_CACHE_TIMEOUT)
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode('utf8')).hexdigest()
+
+
+# ETag i czas ostatniej zmiany dla list obejmujących wszystkie serwery, with_status dla list pokazujących status
+def all_servers_validators(prefix, with_status=False):
+    aggregates = {'count': Count('id'), 'version': Sum('content_version'), 'updated': Max('content_updated')}
+    if with_status:
+        aggregates['status_updated'] = Max('status_updated')
+    versions = Server.objects.aggregate(**aggregates)
+    last_modified = max(filter(None, [versions['updated'], versions.get('status_updated')]), default=None)
+    return make_etag(prefix, *versions.values()), last_modified
+
+
+# Zwraca odpowiedź 304 (albo 412), jeśli kopia klienta jest aktualna, w przeciwnym razie None
+def conditional_response(request, etag, last_modified):
+    last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified, private=False):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    # Przeglądarka ma zawsze pytać serwer, czy kopia jest aktualna, zamiast zgadywać na podstawie Last-Modified
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,61 @@
+import logging
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+# Ceny brutto numerów SMS, takie same jak pokazywane kupującym w sklepie
+
+LVLUP_SMS_PRICES = {
+    70068: Decimal('0.62'),
+    7168: Decimal('1.23'),
+    72068: Decimal('2.46'),
+    73068: Decimal('3.69'),
+    74068: Decimal('4.92'),
+    75068: Decimal('6.15'),
+    76068: Decimal('7.38'),
+    79068: Decimal('11.07'),
+    91068: Decimal('12.30'),
+    91758: Decimal('20.91'),
+    92578: Decimal('30.75')
+}
+
+MICROSMS_SMS_PRICES = {
+    71480: Decimal('1.23'),
+    72480: Decimal('2.46'),
+    73480: Decimal('3.69'),
+    74480: Decimal('4.92'),
+    75480: Decimal('6.15'),
+    76480: Decimal('7.38'),
+    79480: Decimal('11.07'),
+    91400: Decimal('17.22'),
+    91900: Decimal('23.37'),
+    92022: Decimal('24.60'),
+    92521: Decimal('30.75')
+}
+
+
+def format_price(price):
+    return f'{price:.2f}'.replace('.', ',') + ' PLN'
+
+
+# Zakupy przez SMS mają w lvlup_id nazwę operatora, przelewy lvlup mają tam id płatności
+def purchase_operator(lvlup_id):
+    if lvlup_id in ('lvlup_sms', 'microsms_sms'):
+        return lvlup_id
+    return 'lvlup_other'
+
+
+def product_price(operator, lvlup_other_price, lvlup_sms_number, microsms_sms_number):
+    if operator == 'lvlup_sms':
+        return LVLUP_SMS_PRICES.get(lvlup_sms_number, Decimal('0'))
+    if operator == 'microsms_sms':
+        return MICROSMS_SMS_PRICES.get(microsms_sms_number, Decimal('0'))
+    # Ceny zapisane przez panel admina albo starsze wersje sklepu mogą mieć przecinek dziesiętny
+    try:
+        price = Decimal((lvlup_other_price or '0').strip().replace(',', '.'))
+        if price.is_finite():
+            return price.quantize(Decimal('0.01'))
+    except ArithmeticError:
+        pass
+    logger.warning('Niepoprawna cena produktu: %r', lvlup_other_price)
+    return Decimal('0')
@@ -0,0 +1,44 @@
+from collections import namedtuple
+
+from shop.models import Product, Purchase
+
+"""
+Dane potrzebne widokom płatności (produkt, serwer i operator płatności) pobierane jednym zapytaniem.
+Operator jest dołączany przez server__paymentoperator, a ograniczenie (server, operator_type)
+gwarantuje, że dla danego typu operatora zapytanie zwróci najwyżej jeden wiersz.
+"""
+
+PurchaseContext = namedtuple('PurchaseContext', [
+    'purchase_id', 'buyer',  # Tylko dla istniejącego zakupu (load_purchase_context)
+    'product_id', 'product_name', 'product_commands', 'lvlup_other_price',
+    'server_id', 'server_status',
+    'client_id', 'api_key', 'service_id', 'sms_content'
+])
+
+PRODUCT_FIELDS = ['id', 'product_name', 'product_commands', 'lvlup_other_price', 'server_id', 'server__server_status']
+OPERATOR_FIELDS = ['client_id', 'api_key', 'service_id', 'sms_content']
+
+
+# None, jeśli produkt nie istnieje, nie pasuje do filtrów albo serwer nie ma takiego operatora
+def load_product_context(product_id, operator_type, **filters):
+    row = Product.objects.filter(
+        id=product_id, server__paymentoperator__operator_type=operator_type, **filters
+    ).values_list(
+        *PRODUCT_FIELDS, *['server__paymentoperator__' + field for field in OPERATOR_FIELDS]
+    ).first()
+    if row is None:
+        return None
+    return PurchaseContext(None, None, *row)
+
+
+# Zakup czekający na płatność (status 0) o danym id płatności
+def load_purchase_context(lvlup_id, operator_type):
+    row = Purchase.objects.filter(
+        lvlup_id=lvlup_id, status=0, product__server__paymentoperator__operator_type=operator_type
+    ).values_list(
+        'id', 'buyer', *['product__' + field for field in PRODUCT_FIELDS],
+        *['product__server__paymentoperator__' + field for field in OPERATOR_FIELDS]
+    ).first()
+    if row is None:
+        return None
+    return PurchaseContext(*row)
@@ -0,0 +1,64 @@
+import asyncio
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from shop.models import Server
+from shop.utils.functions import check_rcon_connection_async
+
+
+"""
+Sprawdzanie połączeń rcon wszystkich serwerów. Serwery są sprawdzane równolegle
+(najwyżej RCON_HEALTH_CHECK_CONCURRENCY naraz), a ich starty rozłożone w oknie
+RCON_HEALTH_CHECK_WINDOW sekund. Status zmienia się na błąd dopiero po
+RCON_HEALTH_CHECK_FAILURES nieudanych próbach z rzędu.
+"""
+
+
+async def probe_servers(servers, window, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    step = window / len(servers) if servers else 0
+
+    async def probe(server, delay):
+        await asyncio.sleep(delay)
+        async with semaphore:
+            return server.id, await check_rcon_connection_async(server.server_ip, server.rcon_password,
+                                                                server.rcon_port)
+
+    results = await asyncio.gather(*[probe(server, i * step) for i, server in enumerate(servers)])
+    return dict(results)
+
+
+class RconHealthChecker(object):
+    def __init__(self, window=None, concurrency=None, failure_threshold=None):
+        self.window = settings.RCON_HEALTH_CHECK_WINDOW if window is None else window
+        self.concurrency = concurrency or settings.RCON_HEALTH_CHECK_CONCURRENCY
+        self.failure_threshold = failure_threshold or settings.RCON_HEALTH_CHECK_FAILURES
+        self.failures = {}
+
+    def run_once(self):
+        servers = list(Server.objects.only('id', 'server_ip', 'rcon_password', 'rcon_port', 'rcon_status'))
+        if not servers:
+            return 0
+
+        results = asyncio.run(probe_servers(servers, self.window, self.concurrency))
+        self.failures = {server_id: count for server_id, count in self.failures.items() if server_id in results}
+
+        changed = []
+        for server in servers:
+            if results[server.id]:
+                self.failures.pop(server.id, None)
+                rcon_status = True
+            else:
+                self.failures[server.id] = self.failures.get(server.id, 0) + 1
+                rcon_status = server.rcon_status and self.failures[server.id] < self.failure_threshold
+
+            if rcon_status != server.rcon_status:
+                server.rcon_status = rcon_status
+                server.content_version = F('content_version') + 1
+                server.content_updated = timezone.now()
+                changed.append(server)
+
+        Server.objects.bulk_update(changed, ['rcon_status', 'content_version', 'content_updated'], batch_size=500)
+        return len(changed)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from django.conf import settings
+
+from shop.utils.rcon import RconClient
+
+
+class RconConnection(object):
+    def __init__(self, server_ip, rcon_password, rcon_port):
+        self.signature = (server_ip, rcon_password, int(rcon_port))
+        self.lock = threading.Lock()
+        self.rcon = None
+        self.last_used = 0
+
+    def close(self):
+        if self.rcon is not None:
+            self.rcon.close()
+            self.rcon = None
+
+
+"""
+Pula połączeń rcon współdzielona przez cały proces, kluczem jest id serwera.
+Połączenie jest zamykane, gdy zmieni się ip, port lub hasło serwera, gdy leży
+nieużywane dłużej niż RCON_POOL_MAX_IDLE sekund albo gdy nie przejdzie sprawdzenia.
+"""
+
+
+class RconPool(object):
+    def __init__(self, max_idle, health_check_after, timeout):
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.last_eviction = time.monotonic()
+
+    def _get_connection(self, server_id, server_ip, rcon_password, rcon_port):
+        signature = (server_ip, rcon_password, int(rcon_port))
+        with self.lock:
+            connection = self.connections.get(server_id)
+            if connection is None or connection.signature != signature:
+                connection = RconConnection(server_ip, rcon_password, rcon_port)
+                self.connections[server_id] = connection
+        return connection
+
+    def _connect(self, connection):
+        now = time.monotonic()
+        if connection.rcon is not None:
+            idle = now - connection.last_used
+            if idle > self.max_idle:
+                connection.close()
+            elif idle > self.health_check_after and not connection.rcon.is_alive():
+                connection.close()
+
+        if connection.rcon is None:
+            server_ip, rcon_password, rcon_port = connection.signature
+            # Tryb potokowy jest wyłączany tylko dla połączenia, w którym serwer zgubił pakiety
+            rcon = RconClient(server_ip, rcon_port, rcon_password, self.timeout)
+            rcon.connect()
+            connection.rcon = rcon
+
+    def send_commands(self, server_id, server_ip, rcon_password, rcon_port, commands):
+        server_ip = str(server_ip).split(':')[0]
+        if time.monotonic() - self.last_eviction > self.health_check_after:
+            self.evict_idle()
+        connection = self._get_connection(server_id, server_ip, rcon_password, rcon_port)
+        with connection.lock:
+            try:
+                self._connect(connection)
+                results = connection.rcon.command_batch(commands)
+            except Exception:
+                connection.close()
+                raise
+            finally:
+                connection.last_used = time.monotonic()
+
+            # Inny wątek mógł w międzyczasie podmienić połączenie po zmianie danych serwera
+            with self.lock:
+                replaced = self.connections.get(server_id) is not connection
+            if replaced:
+                connection.close()
+        return results
+
+    def discard(self, server_id):
+        with self.lock:
+            connection = self.connections.pop(server_id, None)
+        if connection is not None:
+            with connection.lock:
+                connection.close()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        self.last_eviction = now
+        with self.lock:
+            connections = list(self.connections.items())
+        for server_id, connection in connections:
+            if now - connection.last_used <= self.max_idle or not connection.lock.acquire(blocking=False):
+                continue
+            try:
+                connection.close()
+                with self.lock:
+                    if self.connections.get(server_id) is connection:
+                        del self.connections[server_id]
+            finally:
+                connection.lock.release()
+
+    def close_all(self):
+        with self.lock:
+            server_ids = list(self.connections)
+        for server_id in server_ids:
+            self.discard(server_id)
+
+
+rcon_pool = RconPool(
+    max_idle=settings.RCON_POOL_MAX_IDLE,
+    health_check_after=settings.RCON_POOL_HEALTH_CHECK_AFTER,
+    timeout=settings.RCON_TIMEOUT
+)
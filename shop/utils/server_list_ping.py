@@ -0,0 +1,282 @@
+import asyncio
+import ipaddress
+import json
+import random
+import struct
+
+from django.conf import settings
+
+"""
+Server List Ping - ten sam protokół, którym klient Minecrafta pobiera wersję i liczbę graczy na liście serwerów.
+https://wiki.vg/Server_List_Ping
+
+Najpierw wysyłany jest handshake i zapytanie o status (1.7+). Jeśli serwer odpowie czymś innym,
+próbujemy starego pingu 0xFE 0x01 (1.4 - 1.6). Adres bez portu jest najpierw rozwiązywany
+przez rekord SRV _minecraft._tcp, tak jak robi to klient gry.
+"""
+
+DEFAULT_PORT = 25565
+PROTOCOL_VERSION = -1  # Serwer odpowiada wtedy swoją własną wersją protokołu
+
+
+class PingError(Exception):
+    pass
+
+
+def encode_varint(value):
+    value &= 0xFFFFFFFF
+    out = b''
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+
+async def read_varint(reader):
+    value = 0
+    for i in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            if value & 0x80000000:
+                value -= 1 << 32
+            return value
+    raise PingError('VarInt jest za długi.')
+
+
+def encode_string(value):
+    data = value.encode('utf8')
+    return encode_varint(len(data)) + data
+
+
+def encode_packet(packet_id, data):
+    payload = encode_varint(packet_id) + data
+    return encode_varint(len(payload)) + payload
+
+
+def split_address(address):
+    host, _, port = str(address).strip().partition(':')
+    if port:
+        return host, int(port), True
+    return host, DEFAULT_PORT, False
+
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def server_status(version, players_online, players_max):
+    return {
+        'online': True,
+        'version': version,
+        'players': {'online': players_online, 'max': players_max}
+    }
+
+
+def parse_status(data):
+    version = data.get('version') or {}
+    players = data.get('players') or {}
+    return server_status(str(version.get('name', '')), int(players.get('online', 0)), int(players.get('max', 0)))
+
+
+def parse_legacy_status(data):
+    fields = data.split('\x00')
+    # 1.4 - 1.6: §1 \0 protokół \0 wersja \0 motd \0 gracze \0 sloty
+    if fields[0] == '\xa71' and len(fields) >= 6:
+        return server_status(fields[2], int(fields[4]), int(fields[5]))
+    # Beta 1.8 - 1.3: motd § gracze § sloty
+    fields = data.split('\xa7')
+    if len(fields) >= 3:
+        return server_status('', int(fields[-2]), int(fields[-1]))
+    raise PingError('Niepoprawna odpowiedź na stary ping.')
+
+
+async def modern_ping(host, port, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        handshake = encode_varint(PROTOCOL_VERSION) + encode_string(host) + struct.pack('>H', port) + encode_varint(1)
+        writer.write(encode_packet(0x00, handshake) + encode_packet(0x00, b''))
+        await asyncio.wait_for(writer.drain(), timeout)
+
+        async def read_response():
+            length = await read_varint(reader)
+            if length <= 0 or length > 2 ** 21:
+                raise PingError('Niepoprawna długość pakietu.')
+            packet_id = await read_varint(reader)
+            if packet_id != 0x00:
+                raise PingError('Niepoprawny pakiet statusu.')
+            size = await read_varint(reader)
+            return await reader.readexactly(size)
+
+        data = await asyncio.wait_for(read_response(), timeout)
+        return parse_status(json.loads(data.decode('utf8')))
+    finally:
+        writer.close()
+
+
+async def legacy_ping(host, port, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(b'\xfe\x01')
+        await asyncio.wait_for(writer.drain(), timeout)
+
+        async def read_response():
+            header = await reader.readexactly(3)
+            if header[0] != 0xFF:
+                raise PingError('Niepoprawna odpowiedź na stary ping.')
+            (length,) = struct.unpack('>H', header[1:])
+            return (await reader.readexactly(length * 2)).decode('utf-16-be')
+
+        return parse_legacy_status(await asyncio.wait_for(read_response(), timeout))
+    finally:
+        writer.close()
+
+
+def encode_dns_name(name):
+    out = b''
+    for label in name.rstrip('.').split('.'):
+        data = label.encode('idna')
+        out += bytes([len(data)]) + data
+    return out + b'\x00'
+
+
+def read_dns_name(message, offset):
+    labels = []
+    end = None
+    for _ in range(128):
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack('>H', message[offset:offset + 2])[0] & 0x3FFF
+        elif length == 0:
+            return '.'.join(labels), end if end is not None else offset + 1
+        else:
+            labels.append(message[offset + 1:offset + 1 + length].decode('ascii'))
+            offset += 1 + length
+    raise PingError('Niepoprawna odpowiedź DNS.')
+
+
+def parse_srv_response(message, query_id):
+    request_id, flags, questions, answers = struct.unpack('>HHHH', message[:8])
+    if request_id != query_id or flags & 0x000F:
+        return []
+
+    offset = 12
+    for _ in range(questions):
+        offset = read_dns_name(message, offset)[1] + 4
+
+    records = []
+    for _ in range(answers):
+        offset = read_dns_name(message, offset)[1]
+        record_type, record_class, ttl, length = struct.unpack('>HHIH', message[offset:offset + 10])
+        offset += 10
+        if record_type == 33:
+            priority, weight, port = struct.unpack('>HHH', message[offset:offset + 6])
+            target = read_dns_name(message, offset + 6)[0]
+            records.append((priority, -weight, target, port))
+        offset += length
+    return sorted(records)
+
+
+def system_nameserver():
+    try:
+        with open('/etc/resolv.conf') as resolv_conf:
+            for line in resolv_conf:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    return fields[1]
+    except OSError:
+        pass
+    return None
+
+
+class DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.response = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if not self.response.done():
+            self.response.set_result(data)
+
+    def error_received(self, exc):
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+# Zwraca (host, port) z rekordu SRV o najniższym priorytecie albo None
+async def resolve_srv(host, timeout, nameserver=None, nameserver_port=53):
+    nameserver = nameserver or settings.SERVER_PING_NAMESERVER or system_nameserver()
+    if not nameserver:
+        return None
+
+    query_id = random.randint(0, 0xFFFF)
+    try:
+        query = struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+        query += encode_dns_name('_minecraft._tcp.' + host) + struct.pack('>HH', 33, 1)
+        transport, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+            DnsProtocol, remote_addr=(nameserver, nameserver_port))
+    except (OSError, ValueError):
+        return None
+
+    try:
+        transport.sendto(query)
+        records = parse_srv_response(await asyncio.wait_for(protocol.response, timeout), query_id)
+    except (asyncio.TimeoutError, OSError, PingError, ValueError, IndexError, struct.error):
+        return None
+    finally:
+        transport.close()
+
+    if not records:
+        return None
+    priority, weight, target, port = records[0]
+    return target.rstrip('.'), port
+
+
+async def ping_server(address, timeout=None):
+    timeout = timeout or settings.SERVER_PING_TIMEOUT
+    try:
+        host, port, explicit_port = split_address(address)
+    except ValueError:
+        return {'online': False}
+    if not host:
+        return {'online': False}
+
+    if not explicit_port and not is_ip_address(host):
+        srv = await resolve_srv(host, timeout)
+        if srv:
+            host, port = srv
+
+    try:
+        return await modern_ping(host, port, timeout)
+    except (asyncio.TimeoutError, OSError):
+        # Na zamknięty port lub brak odpowiedzi nie ma sensu wysyłać starego pingu
+        return {'online': False}
+    except (asyncio.IncompleteReadError, PingError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+    try:
+        return await legacy_ping(host, port, timeout)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError, PingError, ValueError):
+        return {'online': False}
+
+
+async def ping_servers(addresses, timeout=None, concurrency=None):
+    semaphore = asyncio.Semaphore(concurrency or settings.SERVER_PING_CONCURRENCY)
+
+    async def ping(address):
+        async with semaphore:
+            return await ping_server(address, timeout)
+
+    return await asyncio.gather(*[ping(address) for address in addresses])
+
+
+def ping(address, timeout=None):
+    return asyncio.run(ping_server(address, timeout))
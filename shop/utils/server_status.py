@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from shop.models import Server
+from shop.utils.server_list_ping import ping_servers
+
+
+"""
+Odświeżanie wersji, statusu i liczby graczy serwerów.
+
+Harmonogram jest trzymany w pamięci procesu run_worker. Serwery, których sklep lub panel ktoś
+niedawno oglądał, są sprawdzane co SERVER_STATUS_ACTIVE_INTERVAL sekund, pozostałe co
+SERVER_STATUS_INTERVAL. Wyłączone serwery są sprawdzane coraz rzadziej, najwyżej co
+SERVER_STATUS_MAX_INTERVAL. Do bazy trafiają tylko zmienione wiersze, jednym bulk_update na paczkę.
+"""
+
+STATUS_FIELDS = ['server_status', 'server_version', 'server_players']
+
+
+class ServerStatusRefresher(object):
+    def __init__(self):
+        self.schedule = {}  # id serwera -> (czas następnego sprawdzenia, liczba nieudanych prób z rzędu)
+
+    def next_check_in(self, online, failures, recently_viewed):
+        if online:
+            return settings.SERVER_STATUS_ACTIVE_INTERVAL if recently_viewed else settings.SERVER_STATUS_INTERVAL
+        interval = min(settings.SERVER_STATUS_INTERVAL * 2 ** (failures - 1), settings.SERVER_STATUS_MAX_INTERVAL)
+        if recently_viewed:
+            interval = min(interval, settings.SERVER_STATUS_ACTIVE_INTERVAL)
+        return interval
+
+    def run_once(self):
+        now = time.monotonic()
+        viewed_after = timezone.now() - timedelta(seconds=settings.SERVER_STATUS_ACTIVE_WINDOW)
+        servers = list(Server.objects.values('id', 'server_ip', 'last_viewed', *STATUS_FIELDS))
+        self.schedule = {server['id']: self.schedule[server['id']] for server in servers if server['id'] in self.schedule}
+
+        due = [server for server in servers if self.schedule.get(server['id'], (0, 0))[0] <= now]
+        if not due:
+            return 0
+
+        statuses = asyncio.run(ping_servers([server['server_ip'] for server in due]))
+
+        changed = []
+        updated = timezone.now()
+        for server, status in zip(due, statuses):
+            failures = 0 if status['online'] else self.schedule.get(server['id'], (0, 0))[1] + 1
+            recently_viewed = server['last_viewed'] is not None and server['last_viewed'] >= viewed_after
+            self.schedule[server['id']] = (now + self.next_check_in(status['online'], failures, recently_viewed),
+                                           failures)
+
+            values = {'server_status': status['online']}
+            if status['online']:
+                values['server_version'] = status['version'][:50]
+                values['server_players'] = (str(status['players']['online']) + '/' + str(status['players']['max']))[:10]
+            if any(server[field] != value for field, value in values.items()):
+                server.update(values)
+                changed.append(Server(id=server['id'], status_updated=updated,
+                                      **{field: server[field] for field in STATUS_FIELDS}))
+
+        # Sklep nie pokazuje tych pól, więc content_version (cache strony sklepu i jej ETag) zostaje bez zmian
+        Server.objects.bulk_update(changed, STATUS_FIELDS + ['status_updated'],
+                                   batch_size=settings.SERVER_STATUS_BATCH_SIZE)
+        return len(changed)
+
+
+# Zapis last_viewed jest ograniczony do jednego na SERVER_VIEW_TRACKING_INTERVAL sekund dla serwera w procesie
+_viewed = {}
+_viewed_lock = threading.Lock()
+
+
+def mark_server_viewed(server_id):
+    now = time.monotonic()
+    with _viewed_lock:
+        if now - _viewed.get(server_id, -settings.SERVER_VIEW_TRACKING_INTERVAL) < settings.SERVER_VIEW_TRACKING_INTERVAL:
+            return
+        _viewed[server_id] = now
+    Server.objects.filter(id=server_id).update(last_viewed=timezone.now())
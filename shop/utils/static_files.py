@@ -0,0 +1,158 @@
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.views import serve as staticfiles_serve
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+"""
+Pliki statyczne po python manage.py collectstatic:
+- każdy plik dostaje kopię z hashem treści w nazwie (np. css/styles.55e7cbb9ba48.css), a {% static %} zwraca tę nazwę,
+- do plików tekstowych zapisywane są obok wersje .gz i .br (brotli, jeśli pakiet jest zainstalowany).
+
+serve_static wybiera wersję zgodnie z Accept-Encoding, a pliki z hashem w nazwie oznacza jako niezmienne,
+bo zmiana treści oznacza nowy adres.
+"""
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot')
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Szablony odwołujące się do pliku spoza manifestu dostają jego zwykłą nazwę zamiast błędu
+    manifest_strict = False
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                # Część css z ckeditor wskazuje na pliki, których nie ma w paczce, te adresy zostają bez zmian
+                return matchobj.group(0)
+
+        return convert
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            if len(content) < MIN_COMPRESS_SIZE:
+                continue
+            for encoding, extension in ENCODINGS:
+                compressed = compress(content, encoding)
+                if compressed is not None and len(compressed) < len(content):
+                    if self.exists(name + extension):
+                        self.delete(name + extension)
+                    self._save(name + extension, ContentFile(compressed))
+
+
+def compress(content, encoding):
+    if encoding == 'gzip':
+        # mtime=0, żeby ten sam plik zawsze dawał identyczny wynik
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(content, quality=11)
+    return None
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        encoding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+_manifest = {'mtime': None, 'hashed': frozenset()}
+_manifest_lock = threading.Lock()
+
+
+# Nazwy plików z hashem z manifestu, wczytywane ponownie po każdym collectstatic
+def hashed_names():
+    path = os.path.join(settings.STATIC_ROOT, CompressedManifestStaticFilesStorage.manifest_name)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return frozenset()
+    with _manifest_lock:
+        if _manifest['mtime'] != mtime:
+            try:
+                with open(path, encoding='utf8') as manifest:
+                    _manifest['hashed'] = frozenset(json.load(manifest).get('paths', {}).values())
+            except (OSError, ValueError):
+                _manifest['hashed'] = frozenset()
+            _manifest['mtime'] = mtime
+        return _manifest['hashed']
+
+
+def serve_static(request, path):
+    if not settings.STATIC_ROOT:
+        # Bez collectstatic (DEBUG) pliki są szukane w STATICFILES_DIRS i katalogach aplikacji
+        return staticfiles_serve(request, path, insecure=True)
+
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    content_type, original_encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    served_path = fullpath
+    content_encoding = original_encoding
+    if original_encoding is None and path.endswith(COMPRESSIBLE_EXTENSIONS):
+        accepted = accepted_encodings(request)
+        for encoding, extension in ENCODINGS:
+            if encoding in accepted and os.path.isfile(fullpath + extension):
+                served_path = fullpath + extension
+                content_encoding = encoding
+                break
+
+    stat = os.stat(served_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = stat.st_size
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+
+    if path in hashed_names():
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={settings.STATIC_CACHE_MAX_AGE}'
+    if path.endswith(COMPRESSIBLE_EXTENSIONS):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,77 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from shop.models import DailySales, Purchase
+
+
+# Liczba zrealizowanych zakupów każdego produktu serwera, jednym zapytaniem z GROUP BY
+def count_product_sales(server_id):
+    sales = Purchase.objects.filter(product__server_id=server_id, status=1).values('product_id').annotate(
+        count=Count('id')).values_list('product_id', 'count')
+    return dict(sales)
+
+
+def add_daily_sales(server_id, product_id, day, operator, count, revenue):
+    key = {'server_id': server_id, 'product_id': product_id, 'day': day, 'operator': operator}
+    if DailySales.objects.filter(**key).update(count=F('count') + count, revenue=F('revenue') + revenue):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(count=count, revenue=revenue, **key)
+    except IntegrityError:
+        # Wiersz dodał w międzyczasie inny proces
+        DailySales.objects.filter(**key).update(count=F('count') + count, revenue=F('revenue') + revenue)
+
+
+# Wywoływane w transakcji, w której zakup dostaje status 1, z załadowanym produktem
+def record_sale(purchase):
+    product = purchase.product
+    add_daily_sales(product.server_id, product.id, timezone.localdate(purchase.date), purchase.operator, 1,
+                    purchase.price)
+
+
+def rebuild_daily_sales(server_id=None, batch_size=1000):
+    purchases = Purchase.objects.filter(status=1)
+    if server_id is not None:
+        purchases = purchases.filter(product__server_id=server_id)
+
+    groups = purchases.annotate(day=TruncDate('date')).values(
+        'product_id', 'product__server_id', 'day', 'operator'
+    ).annotate(count=Count('id'), revenue=Sum('price')).order_by()
+
+    rows = []
+    for group in groups.iterator():
+        rows.append(DailySales(server_id=group['product__server_id'], product_id=group['product_id'],
+                               day=group['day'], operator=group['operator'], count=group['count'],
+                               revenue=group['revenue']))
+
+    with transaction.atomic():
+        existing = DailySales.objects.all()
+        if server_id is not None:
+            existing = existing.filter(server_id=server_id)
+        existing.delete()
+        DailySales.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+# Sprzedaż serwera dzień po dniu i w podziale na produkty, z podsumowań zamiast z tabeli zakupów
+def sales_stats(server_id, start, end, product_id=None):
+    sales = DailySales.objects.filter(server_id=server_id, day__gte=start, day__lte=end)
+    if product_id is not None:
+        sales = sales.filter(product_id=product_id)
+
+    days = sales.values('day').annotate(count=Sum('count'), revenue=Sum('revenue')).order_by('day')
+    products = sales.values('product_id', 'product__product_name').annotate(
+        count=Sum('count'), revenue=Sum('revenue')).order_by('-revenue')
+    operators = sales.values('operator').annotate(count=Sum('count'), revenue=Sum('revenue')).order_by('operator')
+
+    return {
+        'days': [{'day': row['day'].isoformat(), 'count': row['count'], 'revenue': f"{row['revenue']:.2f}"}
+                 for row in days],
+        'products': [{'product_id': row['product_id'], 'product': row['product__product_name'],
+                      'count': row['count'], 'revenue': f"{row['revenue']:.2f}"} for row in products],
+        'operators': [{'operator': row['operator'], 'count': row['count'], 'revenue': f"{row['revenue']:.2f}"}
+                      for row in operators]
+    }
@@ -0,0 +1,74 @@
+import os
+import string
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from shop.models import Voucher, VoucherBatch
+
+"""
+Hurtowe generowanie voucherów. Kody są zapisywane w paczkach po VOUCHER_BATCH_CHUNK_SIZE,
+a kody, które już istnieją na serwerze, pomija unikalny indeks (code, server) - ten sam
+INSERT ... ON CONFLICT DO NOTHING (INSERT IGNORE w MySQL), który buduje bulk_create(ignore_conflicts=True),
+tylko wysyłany przez executemany, bo tworzenie obiektów modelu zajmowało większość czasu.
+Brakujące kody są losowane od nowa, błąd jest zgłaszany dopiero po MAX_IDLE_ROUNDS rundach z rzędu bez nowego kodu.
+"""
+
+CODE_CHARS = string.ascii_uppercase + string.digits
+VOUCHER_COLUMNS = ['product', 'server', 'batch', 'code', 'player', 'status']
+MAX_IDLE_ROUNDS = 10
+
+
+class VoucherBatchError(Exception):
+    pass
+
+
+# Zbiór count różnych kodów, bajty z os.urandom są mapowane na znaki bez przewagi żadnego z nich
+def random_codes(count, length):
+    codes = set()
+    limit = 256 - 256 % len(CODE_CHARS)
+    while len(codes) < count:
+        chars = [CODE_CHARS[byte % len(CODE_CHARS)] for byte in os.urandom((count - len(codes)) * length * 2)
+                 if byte < limit]
+        for i in range(0, len(chars) - length + 1, length):
+            codes.add(''.join(chars[i:i + length]))
+            if len(codes) == count:
+                break
+    return codes
+
+
+def insert_sql():
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(Voucher._meta.get_field(name).column) for name in VOUCHER_COLUMNS)
+    sql = '%s %s (%s) VALUES (%s)' % (connection.ops.insert_statement(ignore_conflicts=True),
+                                      quote_name(Voucher._meta.db_table), columns,
+                                      ', '.join(['%s'] * len(VOUCHER_COLUMNS)))
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    return sql + ' ' + suffix if suffix else sql
+
+
+def insert_codes(batch, count, length, chunk_size):
+    sql = insert_sql()
+    with connection.cursor() as cursor:
+        for offset in range(0, count, chunk_size):
+            codes = random_codes(min(chunk_size, count - offset), length)
+            cursor.executemany(sql, [(batch.product_id, batch.server_id, batch.id, code, "", 0) for code in codes])
+
+
+def generate_voucher_batch(server_id, product_id, count, length=None, chunk_size=None):
+    length = length or settings.VOUCHER_BATCH_CODE_LENGTH
+    chunk_size = chunk_size or settings.VOUCHER_BATCH_CHUNK_SIZE
+
+    with transaction.atomic():
+        batch = VoucherBatch.objects.create(server_id=server_id, product_id=product_id, count=count)
+        missing = count
+        idle_rounds = 0
+        while missing:
+            insert_codes(batch, missing, length, chunk_size)
+            still_missing = count - Voucher.objects.filter(batch=batch).count()
+            idle_rounds = idle_rounds + 1 if still_missing == missing else 0
+            if idle_rounds >= MAX_IDLE_ROUNDS:
+                # Wyjątek wewnątrz transakcji wycofuje też kody zapisane do tej pory
+                raise VoucherBatchError('Nie udało się wygenerować unikalnych kodów.')
+            missing = still_missing
+        return batch
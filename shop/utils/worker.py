@@ -0,0 +1,118 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from shop.models import WorkerLock
+
+logger = logging.getLogger(__name__)
+
+
+"""
+Zadania okresowe (status serwerów, sprawdzanie rcon, kolejka komend) wykonuje tylko ten proces
+run_worker, który trzyma blokadę w bazie. Blokada wygasa po lock_ttl sekundach bez odnowienia,
+więc po awarii lidera jego miejsce zajmuje inny proces, także na innej maszynie.
+"""
+
+
+class LeaderLock(object):
+    def __init__(self, name, ttl):
+        self.name = name
+        self.ttl = ttl
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def acquire(self):
+        now = timezone.now()
+        expires = now + timedelta(seconds=self.ttl)
+        if WorkerLock.objects.filter(Q(owner=self.owner) | Q(expires__lt=now), name=self.name).update(
+                owner=self.owner, expires=expires):
+            return True
+        try:
+            WorkerLock.objects.create(name=self.name, owner=self.owner, expires=expires)
+            return True
+        except IntegrityError:
+            return False
+
+    def release(self):
+        WorkerLock.objects.filter(name=self.name, owner=self.owner).delete()
+
+
+class Job(object):
+    def __init__(self, name, interval, function):
+        self.name = name
+        self.interval = interval
+        self.function = function
+
+
+class Worker(object):
+    def __init__(self, jobs, lock_name='worker', lock_ttl=30):
+        self.jobs = jobs
+        self.lock = LeaderLock(lock_name, lock_ttl)
+        self.stopping = threading.Event()
+        self.leader = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run_job(self, job):
+        next_run = time.monotonic()
+        while not self.stopping.is_set():
+            if not self.leader.is_set():
+                self.leader.wait(1)
+                next_run = time.monotonic()
+                continue
+            if self.stopping.wait(max(next_run - time.monotonic(), 0)):
+                break
+            # W czasie oczekiwania inny proces mógł przejąć blokadę
+            if not self.leader.is_set():
+                continue
+
+            started = time.monotonic()
+            try:
+                job.function()
+            except Exception:
+                logger.exception('Zadanie %s zakończyło się błędem.', job.name)
+            finally:
+                close_old_connections()
+            next_run = started + job.interval
+        connection.close()
+
+    def run(self):
+        threads = [threading.Thread(target=self.run_job, args=(job,), name=job.name) for job in self.jobs]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while not self.stopping.is_set():
+                try:
+                    is_leader = self.lock.acquire()
+                except Exception:
+                    logger.exception('Nie udało się odnowić blokady.')
+                    is_leader = False
+                finally:
+                    close_old_connections()
+
+                if is_leader and not self.leader.is_set():
+                    logger.info('Proces %s przejął wykonywanie zadań.', self.lock.owner)
+                    self.leader.set()
+                elif not is_leader and self.leader.is_set():
+                    logger.warning('Proces %s utracił blokadę.', self.lock.owner)
+                    self.leader.clear()
+                self.stopping.wait(self.lock.ttl / 3)
+        finally:
+            self.stopping.set()
+            self.leader.set()  # Budzi wątki czekające na blokadę, żeby mogły się zakończyć
+            for thread in threads:
+                thread.join()
+            try:
+                self.lock.release()
+            except Exception:
+                logger.exception('Nie udało się zwolnić blokady.')
+            connection.close()
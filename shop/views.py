@@ -1,51 +1,53 @@
 import re
 import requests
-import threading
+from datetime import timedelta
 
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from shop.utils.oauth2 import Oauth
-from shop.utils.functions import send_commands, check_rcon_connection, login_required, generate_random_chars
-
-from .models import Server, PaymentOperator, Product, Purchase, Voucher, ServerNavbarLink
+from shop.utils.functions import check_rcon_connection, login_required, generate_random_chars, set_server_admins, \
+    parse_admins, sanitize_description
+from shop.utils.rcon_pool import rcon_pool
+from shop.utils.delivery import enqueue_delivery
+from shop.utils.domains import domain_routes
+from shop.utils.server_list_ping import ping
+from shop.utils.server_status import mark_server_viewed
+from shop.utils.stats import count_product_sales, sales_stats
+from shop.utils.vouchers import VoucherBatchError, generate_voucher_batch
+from shop.utils.history import InvalidCursor, purchase_history_page, purchase_to_dict, purchase_export_rows, \
+    PURCHASE_EXPORT_HEADER
+from shop.utils.export import EXPORT_FORMATS, export_response
+from shop.utils.http import http_client
+from shop.utils.images import ImageError, get_thumbnail, avatar_url
+from shop.utils.page_cache import touch_server, get_shop_page, set_shop_page, make_etag, conditional_response, \
+    set_validators
+
+from .models import Server, PaymentOperator, Product, Purchase, Voucher, VoucherBatch, ServerNavbarLink
 
 from shop.forms import ProductDescriptionForm
 
 from config import RECAPTCHA_SECRET_KEY
 
-if not settings.DEBUG:
-    from shop.utils.functions import actualize_servers_data, check_rcon
-
-    t1 = threading.Thread(target=actualize_servers_data)
-    t1.start()
-    #t2 = threading.Thread(target=check_rcon)
-    #t2.start()
-
 
 def index(request):
     domain = request.META['HTTP_HOST']
     if not domain == 'ivshop.pl' and not settings.DEBUG:
-        server = Server.objects.filter(domain=domain).values('id', 'domain')
-        if server:
-            return redirect(f"shop/{server[0]['id']}")
+        server_id = domain_routes.resolve(domain)
+        if server_id:
+            return redirect(f"shop/{server_id}")
         else:
             return redirect('https://ivshop.pl')
 
     if 'username' and 'user_id' in request.session:
-        data = []
-        user_id = request.session['user_id']
-        to_data = Server.objects.all()
-        for server in to_data:
-            try:
-                admins = server.admins.split(',')
-            except:
-                admins = []
-            if server.owner_id == int(user_id) or user_id in admins:
-                data.append(server)
+        data = Server.managed_by(request.session['user_id'])
         context = {'data': data}
         return render(request, "index.html", context)
     return render(request, "index.html")
@@ -104,7 +106,7 @@ def add_server(request):
     if not server_name or not server_ip or not rcon_password or not rcon_port:
         return JsonResponse({'message': 'Uzupełnij informacje o serwerze.'}, status=411)
 
-    get_server_data = requests.get('https://api.mcsrvstat.us/2/' + server_ip).json()
+    get_server_data = ping(server_ip)
     status = get_server_data["online"]
     if not status:
         return JsonResponse({'message': 'Serwer jest wyłączony.'}, status=400)
@@ -128,14 +130,13 @@ def add_server(request):
 
 @login_required
 def panel(request, server_id):
-    counted_sells = {}
+    mark_server_viewed(server_id)
     exclude = []
-    counted_products = Product.objects.filter(server__id=server_id).count()
-    purchases_count = Purchase.objects.filter(product__server__id=server_id, status=1).count()
-    purchases = Purchase.objects.filter(product__server__id=server_id).order_by('-date')
     server = Server.objects.get(id=server_id)
-    products = Product.objects.filter(server__id=server_id)
-    vouchers = Voucher.objects.filter(product__server__id=server_id)
+    products = list(Product.objects.filter(server__id=server_id))
+    # Vouchery z paczek są tylko do pobrania jako plik, w panelu byłoby ich za dużo
+    vouchers = Voucher.objects.filter(server_id=server_id, batch__isnull=True).select_related('product')
+    voucher_batches = VoucherBatch.objects.filter(server_id=server_id).select_related('product').order_by('-id')
     payment_operators = PaymentOperator.objects.filter(server__id=server_id)
     server_navigations_links = ServerNavbarLink.objects.filter(server__id=server_id)
 
@@ -143,9 +144,10 @@ def panel(request, server_id):
         if po.operator_type == 'lvlup_sms' or po.operator_type == 'lvlup_other' or po.operator_type == 'microsms_sms':
             exclude.append(po.operator_type)
 
-    for product in products:
-        count = Purchase.objects.filter(product_id=product.id, status=1).count()
-        counted_sells.update({str(product.id): count})
+    sales = count_product_sales(server_id)
+    counted_sells = {str(product.id): sales.get(product.id, 0) for product in products}
+    counted_products = len(products)
+    purchases_count = sum(sales.values())
 
     context = {
         'server_id': server_id,  # Wiem, że rak, do zmiany xD
@@ -153,10 +155,10 @@ def panel(request, server_id):
         'server_ip': server.server_ip,
         'counted_products': counted_products,
         'purchases_count': purchases_count,
-        'purchases': purchases,
         'products': products,
         'counted_sells': counted_sells,
         'vouchers': vouchers,
+        'voucher_batches': voucher_batches,
         'server_logo': server.logo,
         'own_css': server.own_css,
         'rcon_port': server.rcon_port,
@@ -173,13 +175,90 @@ def panel(request, server_id):
     return render(request, 'panel.html', context=context)
 
 
+# Kolejne strony historii zakupów, ładowane w panelu przy przewijaniu listy
+@login_required
+def purchase_history(request, server_id):
+    try:
+        limit = int(request.GET.get('limit') or 0) or None
+        status = request.GET.get('status')
+        status = int(status) if status else None
+        product_id = request.GET.get('product_id')
+        product_id = int(product_id) if product_id else None
+    except ValueError:
+        return JsonResponse({'message': 'Niepoprawne parametry.'}, status=400)
+
+    try:
+        purchases, next_cursor = purchase_history_page(server_id, request.GET.get('cursor'), limit, status,
+                                                       product_id, request.GET.get('buyer'))
+    except InvalidCursor as e:
+        return JsonResponse({'message': str(e)}, status=400)
+
+    return JsonResponse({'purchases': [purchase_to_dict(purchase) for purchase in purchases], 'next': next_cursor})
+
+
+# Pusty parametr to brak ograniczenia, a data w innym formacie niż RRRR-MM-DD to błąd (parse_date zwraca wtedy None)
+def parse_optional_date(value):
+    if not value:
+        return None
+    date = parse_date(value)
+    if date is None:
+        raise ValueError(value)
+    return date
+
+
+# Cała historia zakupów do pobrania, parametry: format (csv albo ndjson), from i to (RRRR-MM-DD), product_id, status
+@login_required
+def export_purchases(request, server_id):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'message': 'Niepoprawny format.'}, status=400)
+    try:
+        start = parse_optional_date(request.GET.get('from'))
+        end = parse_optional_date(request.GET.get('to'))
+        product_id = request.GET.get('product_id')
+        product_id = int(product_id) if product_id else None
+        status = request.GET.get('status')
+        status = int(status) if status else None
+    except ValueError:
+        return JsonResponse({'message': 'Niepoprawne parametry.'}, status=400)
+    if start and end and start > end:
+        return JsonResponse({'message': 'Niepoprawny zakres dat.'}, status=400)
+
+    rows = purchase_export_rows(server_id, start, end, product_id, status)
+    return export_response(export_format, f'zakupy-{server_id}', PURCHASE_EXPORT_HEADER, rows)
+
+
+# Dane do wykresów sprzedaży, parametry from i to w formacie RRRR-MM-DD
+@login_required
+def sales_statistics(request, server_id):
+    try:
+        end = parse_optional_date(request.GET.get('to')) or timezone.localdate()
+        start = (parse_optional_date(request.GET.get('from'))
+                 or end - timedelta(days=settings.SALES_STATS_DEFAULT_DAYS - 1))
+        product_id = request.GET.get('product_id')
+        product_id = int(product_id) if product_id else None
+    except ValueError:
+        return JsonResponse({'message': 'Niepoprawne parametry.'}, status=400)
+
+    if start > end or (end - start).days >= settings.SALES_STATS_MAX_DAYS:
+        return JsonResponse({'message': 'Niepoprawny zakres dat.'}, status=400)
+
+    stats = sales_stats(server_id, start, end, product_id)
+    stats.update({'from': start.isoformat(), 'to': end.isoformat()})
+    return JsonResponse(stats)
+
+
 @login_required
 def add_product(request):
     captcha = request.POST.get("captcha")
 
     if not captcha and not request.POST.get('edit_mode'):
         return JsonResponse({'message': 'Uzupełnij recaptche.'}, status=411)
-    r = requests.post('https://www.google.com/recaptcha/api/siteverify', params={'secret': RECAPTCHA_SECRET_KEY, 'response': captcha}).json()
+    try:
+        r = http_client('recaptcha').post('https://www.google.com/recaptcha/api/siteverify',
+                                          params={'secret': RECAPTCHA_SECRET_KEY, 'response': captcha}).json()
+    except (requests.RequestException, ValueError):
+        return JsonResponse({'message': 'Nie udało się sprawdzić recaptchy, spróbuj ponownie.'}, status=503)
     if not r['success'] and not request.POST.get('edit_mode'):
         return JsonResponse({'message': 'Uzupełnij recaptche xd.'}, status=411)
 
@@ -228,16 +307,19 @@ def add_product(request):
         Product.objects.select_for_update().filter(id=request.POST.get("product_id")).update(
             product_name=product_name,
             product_description=product_description,
+            product_description_html=sanitize_description(product_description),
             lvlup_other_price=lvlup_other_price,
             lvlup_sms_number=lvlup_sms_number,
             microsms_sms_number=microsms_sms_number,
             product_commands=product_commands,
             product_image=product_image)
+        touch_server(server_id)
         return JsonResponse({'message': 'Zapisano zmiany.'}, status=200)
     else:
         p = Product(
             product_name=product_name,
             product_description=product_description,
+            product_description_html=sanitize_description(product_description),
             server=Server.objects.get(id=server_id),
             lvlup_other_price=lvlup_other_price,
             lvlup_sms_number=lvlup_sms_number,
@@ -245,6 +327,7 @@ def add_product(request):
             product_commands=product_commands,
             product_image=product_image)
         p.save()
+        touch_server(server_id)
         return JsonResponse({'message': 'Dodano produkt.'}, status=200)
 
 
@@ -280,7 +363,6 @@ def add_operator(request, operator_type):
             client_id=client_id,
             server=Server.objects.get(id=server_id)
         )
-        new_operator.save()
 
     elif operator_type == 'lvlup_other':
         new_operator = PaymentOperator(
@@ -289,7 +371,6 @@ def add_operator(request, operator_type):
             api_key=api_key,
             server=Server.objects.get(id=server_id)
         )
-        new_operator.save()
 
     elif operator_type == 'microsms_sms':
         new_operator = PaymentOperator(
@@ -300,8 +381,15 @@ def add_operator(request, operator_type):
             sms_content=sms_content,
             server=Server.objects.get(id=server_id)
         )
-        new_operator.save()
 
+    try:
+        with transaction.atomic():
+            new_operator.save()
+    except IntegrityError:
+        # Dwa równoczesne zapytania mogły przejść sprawdzenie powyżej
+        return JsonResponse({'message': 'Dodałeś już takiego operatora.'}, status=409)
+
+    touch_server(server_id)
     messages.add_message(request, messages.SUCCESS, 'Dodano nowego operatora płatności.')
     return JsonResponse({'message': 'Zapisano ustawienia'}, status=200)
 
@@ -328,6 +416,8 @@ def save_settings2(request):
         rcon_password=server_rcon_password,
         rcon_port=server_rcon_port
     )
+    rcon_pool.discard(int(server_id))
+    touch_server(server_id)
 
     return JsonResponse({'message': 'Zapisano ustawienia'}, status=200)
 
@@ -340,7 +430,9 @@ def remove_product(request):
     if not product_to_delete.exists():
         return JsonResponse({'message': 'Taki produkt nie istnieje'}, status=401)
 
+    server_id = product_to_delete[0].server_id
     product_to_delete.delete()
+    touch_server(server_id)
     return JsonResponse({'message': 'Produkt został usunięty.'}, status=200)
 
 
@@ -354,21 +446,74 @@ def generate_voucher(request):
     else:
         code = generate_random_chars(6)
 
-    product = Product.objects.filter(id=product_id, server_id=server_id)
-
-    if not product.exists():
+    product = Product.objects.filter(id=product_id, server_id=server_id).values('id', 'server_id').first()
+    if product is None:
         return JsonResponse({'message': 'Taki produkt nie istnieje.'}, status=401)
 
-    v = Voucher(
-        product=Product.objects.get(id=product_id, server_id=server_id),
-        code=code,
-        status=0
-    )
-    v.save()
+    for attempt in range(5):
+        v = Voucher(
+            product_id=product['id'],
+            server_id=product['server_id'],
+            code=code,
+            status=0
+        )
+        try:
+            with transaction.atomic():
+                v.save()
+            break
+        except IntegrityError:
+            if voucher_code:
+                return JsonResponse({'message': 'Voucher o takim kodzie już istnieje.'}, status=409)
+            code = generate_random_chars(6)
+    else:
+        return JsonResponse({'message': 'Nie udało się wygenerować kodu, spróbuj ponownie.'}, status=409)
 
     return JsonResponse({'message': 'Voucher został wygenerowany. Znajdziesz go w liście voucherów.'}, status=200)
 
 
+@login_required
+def generate_vouchers(request):
+    product_id = request.POST.get('product_id')
+    server_id = request.POST.get('server_id')
+    try:
+        count = int(request.POST.get('count') or 0)
+    except ValueError:
+        count = 0
+    if not 1 <= count <= settings.VOUCHER_BATCH_MAX_SIZE:
+        return JsonResponse({'message': f'Możesz wygenerować od 1 do {settings.VOUCHER_BATCH_MAX_SIZE} voucherów.'},
+                            status=400)
+
+    product = Product.objects.filter(id=product_id, server_id=server_id).values('id', 'server_id').first()
+    if product is None:
+        return JsonResponse({'message': 'Taki produkt nie istnieje.'}, status=401)
+
+    try:
+        batch = generate_voucher_batch(product['server_id'], product['id'], count)
+    except VoucherBatchError as e:
+        return JsonResponse({'message': str(e)}, status=409)
+
+    url = f"/panel/{product['server_id']}/vouchers/{batch.id}/"
+    return JsonResponse({
+        'message': f'Wygenerowano {count} voucherów.',
+        'csv': url + '?format=csv',
+        'ndjson': url + '?format=ndjson'
+    }, status=200)
+
+
+# Pobranie paczki voucherów, parametr format: csv albo ndjson
+@login_required
+def export_vouchers(request, server_id, batch_id):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'message': 'Niepoprawny format.'}, status=400)
+    if not VoucherBatch.objects.filter(id=batch_id, server_id=server_id).exists():
+        raise Http404
+
+    rows = Voucher.objects.filter(batch_id=batch_id).order_by('id').values_list(
+        'code', 'product__product_name', 'status', 'player').iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    return export_response(export_format, f'vouchery-{batch_id}', ['code', 'product', 'status', 'player'], rows)
+
+
 @login_required
 def customize_website(request):
     server_id = request.POST.get("server_id")
@@ -379,13 +524,22 @@ def customize_website(request):
         if check_domain and not str(check_domain[0]['id']) == server_id:
             return JsonResponse({'message': 'Taka domena jest już w bazie.'}, status=409)
 
-    Server.objects.select_for_update().filter(id=server_id).update(
-        logo=request.POST.get("server_logo"),
-        own_css=request.POST.get("own_css"),
-        shop_style=request.POST.get("shop_style"),
-        discord_webhook=request.POST.get("discord_webhook"),
-        admins=request.POST.get("admins").replace(" ", ""),
-        domain=domain)
+    admins = request.POST.get("admins", "").replace(" ", "")
+    _, rejected = parse_admins(admins)
+    if rejected:
+        return JsonResponse({'message': 'Niepoprawne id administratorów: ' + ', '.join(rejected)}, status=406)
+
+    with transaction.atomic():
+        Server.objects.select_for_update().filter(id=server_id).update(
+            logo=request.POST.get("server_logo"),
+            own_css=request.POST.get("own_css"),
+            shop_style=request.POST.get("shop_style"),
+            discord_webhook=request.POST.get("discord_webhook"),
+            admins=admins,
+            domain=domain)
+        set_server_admins(server_id, admins)
+        touch_server(server_id)
+        transaction.on_commit(domain_routes.invalidate)
 
     return JsonResponse({'message': 'Zapisano.'}, status=200)
 
@@ -399,7 +553,9 @@ def remove_payment_operator(request):
     if not operator.exists():
         return JsonResponse({'message': 'Nie znaleziono takiego operatora.'}, status=404)
 
+    server_id = operator[0].server_id
     operator.delete()
+    touch_server(server_id)
     messages.add_message(request, messages.SUCCESS, 'Operator został usunięty.')
     return JsonResponse({'message': 'Operator został usunięty.'}, status=200)
 
@@ -411,8 +567,20 @@ def shop(request, server_id):
     except:
         return render(request, '404.html')
 
+    mark_server_viewed(server_id)
+    etag = make_etag('shop', server_id, check_server_exists.content_version)
+    last_modified = check_server_exists.content_updated
+    response = conditional_response(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    html = get_shop_page(check_server_exists)
+    if html is not None:
+        return set_validators(HttpResponse(html), etag, last_modified)
+
     products = Product.objects.filter(server__id=server_id)
-    purchases = Purchase.objects.filter(product__server__id=server_id, status=1).order_by('-id')[0:5]
+    purchases = Purchase.objects.filter(product__server__id=server_id, status=1).select_related(
+        'product').order_by('-id')[0:5]
     payment_operators = PaymentOperator.objects.filter(server__id=server_id)
     navbar_links = ServerNavbarLink.objects.filter(server__id=server_id)
 
@@ -424,7 +592,9 @@ def shop(request, server_id):
         'navbar_links': navbar_links
     }
 
-    return render(request, 'shop.html', context=context)
+    html = render_to_string('shop.html', context=context, request=request)
+    set_shop_page(check_server_exists, html)
+    return set_validators(HttpResponse(html), etag, last_modified)
 
 
 @csrf_exempt
@@ -439,25 +609,50 @@ def use_voucher(request):
     if not pattern.match(player_nick):
         return JsonResponse({'message': 'Niepoprawny format nicku.'}, status=406)
 
-    voucher = Voucher.objects.filter(code=voucher_code, status=0, product__server_id=server_id).values(
-        'product__server__server_ip',
-        'product__server__rcon_password',
-        'product__product_commands', 'product__server__rcon_port')
-    if not voucher.exists():
+    if not server_id.isdigit():
         return JsonResponse({'message': 'Niepoprawny kod'}, status=401)
 
-    server_ip = voucher[0]['product__server__server_ip']
-    rcon_password = voucher[0]['product__server__rcon_password']
-    commands = voucher[0]['product__product_commands'].split(';')
-    rcon_port = voucher[0]['product__server__rcon_port']
+    vouchers = Voucher.objects.filter(code=voucher_code, server_id=server_id)
+    with transaction.atomic():
+        # Voucher jest zajmowany jednym warunkowym UPDATE, więc z dwóch równoczesnych żądań uda się tylko jedno.
+        # Po dostarczeniu komend dostaje status 1, a gdy się nie uda, wraca do puli (shop/utils/delivery.py).
+        if not vouchers.filter(status=0).update(status=2, player=player_nick):
+            return JsonResponse({'message': 'Niepoprawny kod'}, status=401)
+        voucher = vouchers.values('id', 'product__product_commands')[0]
+        enqueue_delivery(int(server_id), voucher['product__product_commands'], player_nick, voucher_id=voucher['id'])
+    return JsonResponse({'message': 'Voucher został wykorzystany.'}, status=200)
+
 
+def image_response(data, mime_type):
+    response = HttpResponse(data, content_type=mime_type)
+    response['Cache-Control'] = f'public, max-age={settings.IMAGE_CACHE_MAX_AGE}'
+    return response
+
+
+def avatar(request, player, size):
+    if not re.fullmatch(r'\w{3,16}', player):
+        raise Http404
+    size = max(8, min(size, settings.AVATAR_MAX_SIZE))
+    url = avatar_url(player, size)
     try:
-        send_commands(server_ip, rcon_password, commands, player_nick, rcon_port)
-    except:
-        return JsonResponse({'message': 'Wystąpił błąd podczas łączenia się do rcon.'}, status=401)
+        data, mime_type = get_thumbnail(url, size, size, settings.AVATAR_REFRESH_INTERVAL)
+    except ImageError:
+        return HttpResponseRedirect(url)
+    return image_response(data, mime_type)
 
-    voucher.update(status=1, player=player_nick)
-    return JsonResponse({'message': 'Voucher został wykorzystany.'}, status=200)
+
+# Adres zdjęcia jest brany z bazy, więc nie da się tędy pobrać dowolnej strony
+def product_image(request, product_id):
+    url = Product.objects.filter(id=product_id).values_list('product_image', flat=True).first()
+    if not url:
+        raise Http404
+    try:
+        data, mime_type = get_thumbnail(url, settings.PRODUCT_IMAGE_MAX_WIDTH, settings.PRODUCT_IMAGE_MAX_HEIGHT)
+    except ImageError:
+        if not url.startswith(('http://', 'https://')):
+            raise Http404
+        return HttpResponseRedirect(url)
+    return image_response(data, mime_type)
 
 
 def success_page(request):
@@ -480,6 +675,7 @@ def check_rcon_status(request):
     server.update(
         rcon_status=True
     )
+    touch_server(server_id)
 
     return JsonResponse({'message': 'Sukces, połączenie rcon ponownie działa.'}, status=200)
 
@@ -499,6 +695,7 @@ def add_link(request):
         url=url
     )
     link.save()
+    touch_server(server_id)
 
     return JsonResponse({'message': 'Dodano link.'}, status=200)
 
@@ -516,5 +713,6 @@ def remove_link(request):
         return JsonResponse({'message': 'Link o takim id nie istnieje.'}, status=404)
 
     link.delete()
+    touch_server(server_id)
 
     return JsonResponse({'message': 'Usunięto link.'}, status=200)
\ No newline at end of file
@@ -353,6 +353,27 @@ $(document).ready(function() {
         var product_id = $('#add_voucher_product').val();
         var server_id = $("#server_id").val();
         var voucher_code = $("#own_voucher_code").val();
+        var count = parseInt($("#voucher_count").val()) || 1;
+        if (count > 1) {
+            if (voucher_code) {
+                toastr.error('Własny kod można ustawić tylko dla jednego vouchera.');
+                return;
+            }
+            $.ajax({
+                url: '/generate_vouchers/',
+                type: 'POST',
+                data: {product_id: product_id, server_id: server_id, count: count},
+                success: function (data) {
+                    $('#addVoucherModal').modal('hide');
+                    toastr.success(data.message);
+                    window.location.href = data.csv;
+                },
+                error: function (data) {
+                    toastr.error(data.responseJSON.message);
+                }
+            });
+            return;
+        }
         $.ajax({
             url: '/generate_voucher/',
             type: 'POST',
@@ -456,4 +477,78 @@ $(document).ready(function() {
             }
         });
     });
+    // Historia zakupów jest ładowana stronami, kolejna strona zaczyna się od kursora zwróconego przez poprzednią
+    var purchases_cursor = null;
+    var purchases_request = 0;
+    var purchase_status_icons = {
+        0: '<svg width="1em" height="1em" viewBox="0 0 16 16" class="bi bi-x" fill="currentColor" xmlns="http://www.w3.org/2000/svg"><path fill-rule="evenodd" d="M11.854 4.146a.5.5 0 0 1 0 .708l-7 7a.5.5 0 0 1-.708-.708l7-7a.5.5 0 0 1 .708 0z"/><path fill-rule="evenodd" d="M4.146 4.146a.5.5 0 0 0 0 .708l7 7a.5.5 0 0 0 .708-.708l-7-7a.5.5 0 0 0-.708 0z"/></svg>',
+        1: '<svg width="1em" height="1em" viewBox="0 0 16 16" class="bi bi-check2" fill="currentColor" xmlns="http://www.w3.org/2000/svg"><path fill-rule="evenodd" d="M13.854 3.646a.5.5 0 0 1 0 .708l-7 7a.5.5 0 0 1-.708 0l-3.5-3.5a.5.5 0 1 1 .708-.708L6.5 10.293l6.646-6.647a.5.5 0 0 1 .708 0z"/></svg>',
+        2: 'W kolejce',
+        3: 'Błąd rcon'
+    };
+    function load_purchases(reset) {
+        var server_id = $('#server_id').val();
+        var request_number = ++purchases_request;
+        if (reset) {
+            purchases_cursor = null;
+            $('#purchases_history').empty();
+        }
+        var data = {
+            status: $('#purchases_filter_status').val(),
+            product_id: $('#purchases_filter_product').val(),
+            buyer: $('#purchases_filter_buyer').val()
+        };
+        if (purchases_cursor) {
+            data.cursor = purchases_cursor;
+        }
+        $('.load_more_purchases').prop('disabled', true);
+        $.ajax({
+            url: '/panel/' + server_id + '/purchases/',
+            type: 'GET',
+            data: data,
+            success: function (data) {
+                // Odpowiedź na zapytanie sprzed zmiany filtrów
+                if (request_number != purchases_request) {
+                    return;
+                }
+                $.each(data.purchases, function (i, purchase) {
+                    $('#purchases_history').append($('<tr>').append(
+                        $('<td>').text(purchase.product),
+                        $('<td>').text(purchase.buyer),
+                        $('<td>').html(purchase_status_icons[purchase.status]),
+                        $('<td>').text(purchase.date)
+                    ));
+                });
+                purchases_cursor = data.next;
+                $('.load_more_purchases').toggle(data.next !== null).prop('disabled', false);
+            },
+            error: function (data) {
+                try {
+                    toastr.error(data.responseJSON.message);
+                } catch (e) {
+                    toastr.error('Nie udało się pobrać historii zakupów.');
+                }
+                $('.load_more_purchases').prop('disabled', false);
+            }
+        });
+    }
+    $(document).on('show.bs.modal', '#paymentsHistoryModal', function () {
+        load_purchases(true);
+    });
+    $(document).on("click", ".load_more_purchases", function () {
+        load_purchases(false);
+    });
+    $(document).on("change", ".purchases_filter", function () {
+        load_purchases(true);
+    });
+    $(document).on("click", ".export_purchases_button", function () {
+        var params = {
+            format: $(this).data('format'),
+            status: $('#purchases_filter_status').val(),
+            product_id: $('#purchases_filter_product').val(),
+            from: $('#purchases_export_from').val(),
+            to: $('#purchases_export_to').val()
+        };
+        window.location.href = '/panel/' + $('#server_id').val() + '/purchases/export/?' + $.param(params);
+    });
 });
\ No newline at end of file